@@ -1,32 +1,171 @@
+from functools import partial
 from algorithms.a_star import AStar
 from algorithms.breadth_first_search import BreadthFirstSearch
 from algorithms.depth_first_search import DepthFirstSearch
 from algorithms.hill_climbing import HillClimbing
+from algorithms.ida_star import IDAStar
+from algorithms.parallel_a_star import ParallelAStar
 from algorithms.uniform_cost_search import UniformCostSearch
-from game_renderer.game_renderer import GameRenderer
 from game_engine import GameEngine
+from bitboard_engine import BitboardEngine
+
+def batch_engine(**options):
+    """Create the batch engine, imported on first use (numpy is only imported by it)"""
+    from batch_engine import BatchEngine
+    return BatchEngine(**options)
+
+ENGINES = {
+    "dict": GameEngine,
+    "delta": partial(GameEngine, delta_successors=True),
+    "bitboard": BitboardEngine,
+    "batch": batch_engine
+}
+
+ALGORITHMS = {
+    "dfs": DepthFirstSearch,
+    "depth first search": DepthFirstSearch,
+    "bfs": BreadthFirstSearch,
+    "breadth first search": BreadthFirstSearch,
+    "ucs": UniformCostSearch,
+    "uniform cost search": UniformCostSearch,
+    "hc": HillClimbing,
+    "hill climbing": HillClimbing,
+    "a_star": AStar,
+    "ida_star": IDAStar,
+    "ida star": IDAStar,
+    "hda_star": ParallelAStar,
+    "parallel a star": ParallelAStar
+}
+
+# The algorithms that take an open_list (see algorithms.open_list)
+OPEN_LIST_ALGORITHMS = (AStar, UniformCostSearch, HillClimbing)
+# The algorithms that take a closed_set (see algorithms.closed_set)
+CLOSED_SET_ALGORITHMS = (BreadthFirstSearch, DepthFirstSearch, UniformCostSearch, AStar, HillClimbing)
 
 class AlgorithmMode:
-    def __init__(self, level_file, algorithm):
-        self.renderer = GameRenderer(cell_size=60)
-        self.engine = GameEngine()
+    def __init__(self, level_file, algorithm, engine="dict", open_list=None, fluid_pruning=False,
+                 closed_set=None, cache=None, telemetry=None, compare_serial=False, table_memory_mb=None):
+        """
+        open_list: 'heap' or 'bucket' for the algorithms with an open list (UCS, A*, hill climbing)
+        closed_set: 'states', 'compact' or 'disk' for BFS, DFS, UCS, A* and hill climbing
+        fluid_pruning: also prune the states where lava gets to a goal orb before the player
+        cache: a SolutionCache to reuse the solutions of earlier runs from (and store them in)
+        telemetry: a SearchTelemetry that the search reports its progress to
+        compare_serial: also solve with the serial A* and report the speedup (parallel A* only)
+        table_memory_mb: memory of the IDA* transposition and bound tables
+        """
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine: {engine}")
+        self.engine = ENGINES[engine](fluid_pruning=fluid_pruning)
+        self.engine_name = engine
         self.level_file = level_file
         self.algorithm = algorithm
+        self.open_list = open_list
+        self.closed_set = closed_set
+        self.cache = cache
+        self.telemetry = telemetry
+        self.compare_serial = compare_serial
+        self.table_memory_mb = table_memory_mb
+
+    def create_algorithm(self):
+        """Create the solver for the algorithm name"""
+        algorithm_class = ALGORITHMS.get(self.algorithm.lower())
+        if algorithm_class is None:
+            raise ValueError(f"Unknown algorithm: {self.algorithm}")
+        options = {}
+        if self.open_list is not None:
+            if algorithm_class not in OPEN_LIST_ALGORITHMS:
+                raise ValueError(f"{self.algorithm} doesn't use an open list")
+            options['open_list'] = self.open_list
+        if self.closed_set is not None:
+            if algorithm_class not in CLOSED_SET_ALGORITHMS:
+                raise ValueError(f"{self.algorithm} doesn't use a closed set")
+            options['closed_set'] = self.closed_set
+        if self.compare_serial:
+            if algorithm_class is not ParallelAStar:
+                raise ValueError(f"{self.algorithm} has no serial version to compare with")
+            options['compare_serial'] = True
+        if self.table_memory_mb is not None:
+            if algorithm_class is not IDAStar:
+                raise ValueError(f"{self.algorithm} has no transposition table")
+            options['memory_limit_mb'] = self.table_memory_mb
+        algorithm = algorithm_class(self.level_file, engine=self.engine, **options)
+        algorithm.telemetry = self.telemetry
+        return algorithm
     
     def run(self):
-        the_algorithm = self.algorithm.lower()
-        if the_algorithm in ["dfs", "depth first search"]:
-            dfs = DepthFirstSearch(self.level_file)
-            dfs.run()
-        elif the_algorithm in ["bfs", "breadth first search"]:
-            bfs = BreadthFirstSearch(self.level_file)
-            bfs.run()
-        elif the_algorithm in ["ucs", "uniform cost search"]:
-            ucs = UniformCostSearch(self.level_file)
-            ucs.run()
-        elif the_algorithm in ["hc", "hill climbing"]:
-            hc = HillClimbing(self.level_file)
-            hc.run()
-        elif the_algorithm in ["a_star"]:
-            a_star = AStar(self.level_file)
-            a_star.run()
+        """Solve the level (or reuse the cached solution) and show the solution path"""
+        algorithm = self.create_algorithm()
+        result = self.cached_result(algorithm)
+        if result is None:
+            result = algorithm.run()
+            self.store(algorithm, result)
+            return result
+        algorithm.get_renderer().render_win_path(self.level_file,
+                                                 result.algorithm_name,
+                                                 result.states_explored,
+                                                 result.generated_states,
+                                                 algorithm.goal_state,
+                                                 result.path_cost,
+                                                 result.search_time)
+        return result
+
+    def solve(self, time_limit=None):
+        """Solve the level (or reuse the cached solution) without rendering anything, return a SolveResult"""
+        algorithm = self.create_algorithm()
+        result = self.cached_result(algorithm)
+        if result is None:
+            result = algorithm.solve(time_limit)
+            self.store(algorithm, result)
+        return result
+
+    # The algorithm options that can change the solution or the statistics stored with it
+    CACHE_OPTIONS = ('open_list', 'closed_set', 'workers', 'batch_size', 'memory_limit_mb', 'compare_serial')
+
+    def cache_name(self, algorithm):
+        """
+        The algorithm part of the cache key: the algorithm, the engine and the options
+        the algorithm was created with, so a result (and its states explored, search time...)
+        is only replayed for the configuration that produced it
+        """
+        name = f"{type(algorithm).__name__}+{self.engine_name}"
+        if self.engine.fluid_pruning:
+            name += "+fluid_pruning"
+        for option in self.CACHE_OPTIONS:
+            value = getattr(algorithm, option, None)
+            if value is not None and value is not False:
+                name += f"+{option}={value}"
+        return name
+
+    def cached_result(self, algorithm):
+        """
+        Return the cached result once its actions are replayed to a win
+        (algorithm.goal_state is set to the replayed goal), or None
+        """
+        if self.cache is None:
+            return None
+        result = self.cache.get(self.level_file, self.cache_name(algorithm))
+        if result is None or not result.solved:
+            return None
+        goal_state = self.replay(result.actions)
+        if goal_state is None:
+            # Not a solution anymore, solve again
+            self.cache.discard(self.level_file, self.cache_name(algorithm))
+            return None
+        algorithm.goal_state = goal_state
+        result.level_file = self.level_file
+        result.cached = True
+        return result
+
+    def store(self, algorithm, result):
+        if self.cache is not None and result.solved:
+            self.cache.put(self.level_file, self.cache_name(algorithm), result)
+
+    def replay(self, actions):
+        """Apply the actions from the initial state, return the goal state or None if they don't win"""
+        state = self.engine.load_level(self.level_file)
+        for action in actions:
+            state = self.engine.transition_model(state, action)
+            if state is None:
+                return None
+        return state if self.engine.goal_test(state) else None
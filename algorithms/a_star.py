@@ -1,117 +1,114 @@
-import time
+import math
 import element
-from queue import PriorityQueue
-from game_engine import GameEngine
-from game_renderer.game_renderer import GameRenderer
+from algorithms.search_algorithm import SearchAlgorithm
+from algorithms.open_list import create_open_list
+from algorithms.closed_set import create_closed_set
+from algorithms.distance_heuristic import DistanceHeuristic
 
-class AStar:
-    def __init__(self, level_file, algorithm_name="A Star"):
-        self.renderer = GameRenderer(cell_size=60)
-        self.engine = GameEngine()
-        self.level_file = level_file
-        self.algorithm_name = algorithm_name
-        self.states_explored = 0
-        self.generated_states = 0
+class AStar(SearchAlgorithm):
+    def __init__(self, level_file, algorithm_name="A Star", engine=None, open_list="heap", closed_set="states"):
+        """
+        open_list: 'heap' or 'bucket' (see algorithms.open_list)
+        closed_set: 'states', 'compact' or 'disk' (see algorithms.closed_set), with 'disk'
+        only the costs of the open list states are kept in memory
+        """
+        super().__init__(level_file, algorithm_name, engine)
+        self.open_list = open_list
+        self.closed_set = closed_set
+        self.frontier = None
+        self.distances = None
+
+    def prepare_heuristic(self, initial_state):
+        """Build (or reuse) the distance maps of the level before searching it"""
+        self.distances = DistanceHeuristic.for_state(initial_state)
 
-    def run(self):
-        initial_state = element.LevelLoader.load_level(self.level_file)
+    def search(self, initial_state):
+        self.prepare_heuristic(initial_state)
         initial_node = Node(state=initial_state, cost=self.heuristic(initial_state))
-        pq = PriorityQueue()
-        pq.put(initial_node)
+        if initial_node.cost == math.inf:
+            return None
+        visited = create_closed_set(self.closed_set, self.engine, initial_state)
+        initial_node.key = visited.key(initial_state)
+        pq = create_open_list(self.open_list)
+        self.frontier = pq
+        self.visited = visited
+        pq.push(initial_node.cost, initial_node)
         self.generated_states += 1
-        best_cost = {initial_node.state: initial_node.cost}
-        visited = set()
-        start_time = time.time()
-        goal_node = None
+        best_cost = {initial_node.key: initial_node.cost}
+        # With the disk closed set, best_cost only holds the states of the open list: a state
+        # leaves it once explored and is then looked up in visited, so no table of every
+        # generated state stays in memory
+        open_costs_only = hasattr(visited, "add_layer")
 
         while not pq.empty():
-            current_node = pq.get()
+            current_node = pq.pop()
             current_state = current_node.state
-            if current_state in visited:
+            if current_node.key in visited:
+                pq.stale += 1
                 continue
-            visited.add(current_state)
+            record = visited.add(current_node.key, current_state, current_node.parent, current_node.action)
+            if open_costs_only:
+                best_cost.pop(current_node.key, None)
             self.states_explored += 1
+            self.search_checkpoint(current_node.cost)
             if self.engine.goal_test(current_state):
-                goal_node = current_node
-                break
-            moves = self.engine.all_valid_moves(current_state)
-            if moves is None:
-                continue
-            for action in moves:
-                new_state = self.engine.transition_model(current_state, action)
-                if new_state is None:
-                    continue
+                return visited.goal(current_state, record)
+            for action, new_state in self.engine.expand(current_state):
                 heuristic = self.heuristic(new_state)
+                if heuristic == math.inf:
+                    # The goal or an orb can't be reached anymore
+                    continue
                 new_cost = heuristic + self.path_cost(current_node, new_state)
-                if new_state not in best_cost or new_cost < best_cost[new_state]:
-                    best_cost[new_state] = new_cost
+                key = visited.key(new_state)
+                if open_costs_only and key in visited:
+                    continue
+                if key not in best_cost or new_cost < best_cost[key]:
+                    best_cost[key] = new_cost
                     new_node = Node(
                         state=new_state,
-                        parent=current_node,
+                        parent=record,
                         action=action,
-                        cost=new_cost
+                        cost=new_cost,
+                        key=key
                     )
-                    pq.put(new_node)
+                    pq.push(new_node.cost, new_node)
                     self.generated_states += 1
             # self.render_each_step(current_state)
-
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-
-        if goal_node is not None:
-            self.renderer.render_win_path(self.level_file,
-                                          self.algorithm_name,
-                                          self.states_explored,
-                                          self.generated_states,
-                                          goal_node.state,
-                                          goal_node.state.path_cost,
-                                          elapsed_time)
-
-    def render_each_step(self, state):
-        status_text = f"moves: {state.path_cost}"
-        self.renderer.render(state, status_text)
+        return None
 
     def heuristic(self, state):
         """
         the heuristic function (that should calculate for each node) is:
-        the distance from the player to all goal_orbs to the goal
-        e.g: player -> goal_orb_1 -> goal_orb_2 -> goal
+        the shortest walk (around the walls) from the player through all the goal_orbs
+        left, in the best order, to the goal (see DistanceHeuristic)
+        e.g: player -> goal_orb_2 -> goal_orb_1 -> goal
         """
-        heuristic = 0
-        if state.player_position is not None:
-            player_position_dx, player_position_dy = state.player_position
-            goal_position_dx, goal_position_dy = state.goal_position
-            previous_goal_orb_dx, previous_goal_orb_dy = 0, 0
-            for goal_orb_dx, goal_orb_dy in state.goal_orb_position:
-                if previous_goal_orb_dx == 0 and previous_goal_orb_dy == 0:
-                    heuristic += abs(goal_orb_dx - player_position_dx)
-                    heuristic += abs(goal_orb_dy - player_position_dy)
-                else:
-                    heuristic += abs(goal_orb_dx - previous_goal_orb_dx)
-                    heuristic += abs(goal_orb_dy - previous_goal_orb_dy)
-                previous_goal_orb_dx = goal_orb_dx
-                previous_goal_orb_dy = goal_orb_dy
-            heuristic += abs(goal_position_dx - previous_goal_orb_dx)
-            heuristic += abs(goal_position_dy - previous_goal_orb_dy)
-        return heuristic
+        if state.player_position is None:
+            return 0
+        return self.distances(state.player_position, state.goal_orb_position)
     
     def path_cost(self, node, new_state):
         """
         the path cost function (that should calculate for each node) is:
         the number of new lava + the previous node cost
         """
-        parent_lava = len(node.state.lava_positions)
-        child_lava = len(new_state.lava_positions)
+        parent_lava = node.state.lava_count
+        child_lava = new_state.lava_count
         delta_lava = max(0, child_lava - parent_lava)
         new_cost = node.cost + delta_lava
         return new_cost
 
 class Node:
-    def __init__(self, state:element.GameState, parent=None, action=None, cost=0):
+    def __init__(self, state:element.GameState, parent=None, action=None, cost=0, key=None):
+        """
+        parent: the closed set record of the parent (or the parent node outside the closed set searches)
+        key: the closed set key of the state
+        """
         self.state = state
         self.parent = parent
         self.action = action
         self.cost = cost
+        self.key = key
 
     def __lt__(self, other):
         return self.cost < other.cost
@@ -1,58 +1,91 @@
-import element
-import time
 from collections import deque
-from game_engine import GameEngine
-from game_renderer.game_renderer import GameRenderer
+from algorithms.search_algorithm import SearchAlgorithm
+from algorithms.closed_set import create_closed_set
 
-class BreadthFirstSearch:
-    def __init__(self, level_file, algorithm_name="BFS"):
-        self.renderer = GameRenderer(cell_size=60)
-        self.engine = GameEngine()
-        self.level_file = level_file
-        self.algorithm_name = algorithm_name
-        self.states_explored = 0
-        self.generated_states = 0
+class BreadthFirstSearch(SearchAlgorithm):
+    def __init__(self, level_file, algorithm_name="BFS", engine=None, closed_set="states"):
+        """
+        closed_set: 'states', 'compact' or 'disk' (see algorithms.closed_set),
+        the layers are checked against 'disk' in batches with add_layer
+        """
+        super().__init__(level_file, algorithm_name, engine)
+        self.closed_set = closed_set
 
-    def run(self):
-        self.initial_state = element.LevelLoader.load_level(self.level_file)
-        start_time = time.time()
-        status = deque([self.initial_state])
+    def search(self, initial_state):
+        self.initial_state = initial_state
+        visited = create_closed_set(self.closed_set, self.engine, initial_state)
+        record = visited.add(visited.key(initial_state), initial_state, None, None)
+        status = deque([(self.initial_state, record)])
+        self.frontier = status
+        self.visited = visited
         self.generated_states += 1
-        visited = set()
-        visited.add(self.initial_state)
-        player_win = False
+        if hasattr(self.engine, "expand_layer") or hasattr(visited, "add_layer"):
+            return self.search_layers(visited, record)
 
         while status:
-            current_state = status.popleft()
+            current_state, record = status.popleft()
             self.states_explored += 1
+            self.search_checkpoint(current_state.path_cost)
             if self.engine.goal_test(current_state):
-                player_win = True
-                break
-            all_valid_move = self.engine.all_valid_moves(current_state)
-            if all_valid_move is None:
-                continue
-            for action in all_valid_move:
-                new_state = self.engine.transition_model(current_state, action)
-                if new_state is None:
-                    continue
-                if new_state not in visited:
-                    visited.add(new_state)
-                    status.append(new_state)
+                return visited.goal(current_state, record)
+            for action, new_state in self.engine.expand(current_state):
+                key = visited.key(new_state)
+                if key not in visited:
+                    status.append((new_state, visited.add(key, new_state, record, action)))
                     self.generated_states += 1
             # self.render_each_step(current_state)
-        
-        end_time = time.time()
-        elapsed_time = end_time - start_time
+        return None
 
-        if player_win:
-            self.renderer.render_win_path(self.level_file,
-                                          self.algorithm_name,
-                                          self.states_explored,
-                                          self.generated_states,
-                                          current_state,
-                                          current_state.path_cost,
-                                          elapsed_time)
-
-    def render_each_step(self, state):
-        status_text = f"moves: {state.path_cost}"
-        self.renderer.render(state, status_text)
+    def search_layers(self, visited, record):
+        """
+        Breadth first search one layer at a time: with one engine call per layer
+        (expand_layer) and with delayed duplicate detection when the closed set has
+        add_layer (the whole next layer is checked against it at once),
+        it visits and generates the states in the same order as the loop in search
+        """
+        layer = [self.initial_state]
+        records = [record]
+        while layer:
+            self.frontier = layer
+            depth = layer[0].path_cost
+            goal_index = None
+            for index, state in enumerate(layer):
+                if self.engine.goal_test(state):
+                    goal_index = index
+                    break
+            if goal_index is not None:
+                self.states_explored += goal_index + 1
+                goal_state = visited.goal(layer[goal_index], records[goal_index])
+                layer = layer[:goal_index]
+            else:
+                self.states_explored += len(layer)
+                goal_state = None
+            self.search_checkpoint(depth)
+            # The records of the parents, by state identity
+            parent_records = {id(state): record for state, record in zip(layer, records)}
+            if hasattr(self.engine, "expand_layer"):
+                children = self.engine.expand_layer(layer)
+            else:
+                children = [(state, action, new_state)
+                            for state in layer for action, new_state in self.engine.expand(state)]
+            next_layer = []
+            next_records = []
+            if hasattr(visited, "add_layer"):
+                for new_state, new_record in visited.add_layer([
+                    (visited.key(new_state), new_state, parent_records[id(parent)], action)
+                    for parent, action, new_state in children
+                ]):
+                    next_layer.append(new_state)
+                    next_records.append(new_record)
+                self.generated_states += len(next_layer)
+            else:
+                for parent, action, new_state in children:
+                    key = visited.key(new_state)
+                    if key not in visited:
+                        next_layer.append(new_state)
+                        next_records.append(visited.add(key, new_state, parent_records[id(parent)], action))
+                        self.generated_states += 1
+            if goal_state is not None:
+                return goal_state
+            layer, records = next_layer, next_records
+        return None
@@ -0,0 +1,268 @@
+import mmap
+import heapq
+import hashlib
+import tempfile
+from array import array
+
+FINGERPRINT_BYTES = 16
+
+def fingerprint(state):
+    """128-bit blake2b fingerprint of state.packed() (the same for equal states of every engine)"""
+    return int.from_bytes(hashlib.blake2b(state.packed(), digest_size=FINGERPRINT_BYTES).digest(), 'little')
+
+class ClosedSet:
+    """
+    The states a search has reached and what it takes to get back to the initial state.
+
+    key(state): what the search indexes its tables by
+    add(key, state, parent, action): store a state reached from the parent record
+    with the action, return the record of the state (its children's parent)
+    goal(state, record): the goal state with its parent chain (for the solution path)
+    """
+    def __init__(self, engine, initial_state):
+        self.engine = engine
+        self.initial_state = initial_state
+
+    def key(self, state):
+        raise NotImplementedError
+
+    def add(self, key, state, parent, action):
+        raise NotImplementedError
+
+    def goal(self, state, record):
+        raise NotImplementedError
+
+    def __contains__(self, key):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+class StateClosedSet(ClosedSet):
+    """The states themselves, every state keeps its parent so the path is the parent chain"""
+    def __init__(self, engine, initial_state):
+        super().__init__(engine, initial_state)
+        self.states = set()
+
+    def key(self, state):
+        return state
+
+    def add(self, key, state, parent, action):
+        self.states.add(key)
+        return state
+
+    def goal(self, state, record):
+        return state
+
+    def __contains__(self, key):
+        return key in self.states
+
+    def __len__(self):
+        return len(self.states)
+
+class CompactClosedSet(ClosedSet):
+    """
+    A 128-bit fingerprint of every state (blake2b of state.packed()), the index of
+    its parent and a 2-bit action code: about 80 bytes per state instead of the state.
+
+    key() cuts the state from its parent, so a state is freed as soon as the search
+    drops it (once it is expanded) instead of being pinned by its children.
+    The goal path is rebuilt by replaying the actions from the initial state.
+    Two states with the same fingerprint would be merged, with 2^128 fingerprints
+    that takes about 2^64 states.
+    """
+
+    def __init__(self, engine, initial_state):
+        super().__init__(engine, initial_state)
+        self.fingerprints = set()
+        # parent index of each state (-1 for the initial state)
+        self.parents = array('i')
+        # 2-bit action codes, 4 per byte
+        self.action_codes = bytearray()
+        self.actions = list(engine.directions)
+        self.codes = {action: code for code, action in enumerate(self.actions)}
+
+    def key(self, state):
+        state.parent = None
+        return fingerprint(state)
+
+    def add(self, key, state, parent, action):
+        self.fingerprints.add(key)
+        index = len(self.parents)
+        self.parents.append(-1 if parent is None else parent)
+        if index % 4 == 0:
+            self.action_codes.append(0)
+        if action is not None:
+            self.action_codes[index // 4] |= self.codes[action] << (index % 4 * 2)
+        return index
+
+    def path(self, record):
+        """Return the actions from the initial state to the state of the record"""
+        actions = []
+        while self.parents[record] != -1:
+            code = self.action_codes[record // 4] >> (record % 4 * 2) & 3
+            actions.append(self.actions[code])
+            record = self.parents[record]
+        actions.reverse()
+        return actions
+
+    def goal(self, state, record):
+        goal_state = self.initial_state
+        for action in self.path(record):
+            goal_state = self.engine.transition_model(goal_state, action)
+        return goal_state
+
+    def __contains__(self, key):
+        return key in self.fingerprints
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+class DiskClosedSet(CompactClosedSet):
+    """
+    Compact closed set that spills the fingerprints to disk: the ones of the last
+    memory_entries states are in memory, the older ones in a sorted file of 16-byte
+    big endian fingerprints (memory mapped) in directory (default: the temporary directory).
+    The memory part is merged into a new file once it is full.
+
+    A lookup is a set probe and a binary search of the file. add_layer() is the
+    delayed duplicate detection of the layered searches: a whole layer is checked
+    against the file at once and merged in a single batch.
+    The parent indices and action codes (about 4 bytes per state) stay in memory.
+    """
+    MEMORY_ENTRIES = 1 << 20
+    # Bytes written to the new file at a time when merging
+    BUFFER_BYTES = 1 << 20
+
+    def __init__(self, engine, initial_state, memory_entries=None, directory=None):
+        super().__init__(engine, initial_state)
+        self.memory_entries = memory_entries or self.MEMORY_ENTRIES
+        self.directory = directory
+        self.file = None
+        self.mapped = None
+        self.spilled = 0
+        self.merges = 0
+
+    def add(self, key, state, parent, action):
+        record = super().add(key, state, parent, action)
+        if len(self.fingerprints) >= self.memory_entries:
+            self.spill()
+        return record
+
+    def add_layer(self, candidates):
+        """
+        Add the (key, state, parent, action) candidates of a layer at once,
+        return the (state, record) pairs of the ones that were not in the set, in order.
+        The candidates left after the memory checks are looked up in the file together:
+        one pass over the file when there are many of them, binary searches otherwise
+        """
+        layer = {}
+        for candidate in candidates:
+            key = candidate[0]
+            if key not in layer and key not in self.fingerprints:
+                layer[key] = candidate
+        if self.spilled and layer:
+            if len(layer) * self.spilled.bit_length() < self.spilled:
+                seen = [key for key in layer if self.on_disk(key)]
+            else:
+                seen = self.scan(layer)
+            for key in seen:
+                del layer[key]
+        added = []
+        for key, state, parent, action in layer.values():
+            added.append((state, super().add(key, state, parent, action)))
+        if len(self.fingerprints) >= self.memory_entries:
+            self.spill()
+        return added
+
+    def on_disk(self, key):
+        """Binary search of the fingerprint in the file"""
+        size = FINGERPRINT_BYTES
+        target = key.to_bytes(size, 'big')
+        low, high = 0, self.spilled
+        while low < high:
+            middle = (low + high) // 2
+            entry = self.mapped[middle * size:(middle + 1) * size]
+            if entry < target:
+                low = middle + 1
+            elif entry > target:
+                high = middle
+            else:
+                return True
+        return False
+
+    def scan(self, keys):
+        """Return the keys that are in the file, with one sequential pass over it"""
+        size = FINGERPRINT_BYTES
+        targets = sorted(key.to_bytes(size, 'big') for key in keys)
+        found = []
+        index = 0
+        for entry in self.disk_entries():
+            while index < len(targets) and targets[index] < entry:
+                index += 1
+            if index == len(targets):
+                break
+            if targets[index] == entry:
+                found.append(int.from_bytes(entry, 'big'))
+        return found
+
+    def disk_entries(self):
+        """Yield the fingerprints of the file in order"""
+        size = FINGERPRINT_BYTES
+        chunk = size * 65536
+        for start in range(0, self.spilled * size, chunk):
+            block = self.mapped[start:start + chunk]
+            for offset in range(0, len(block), size):
+                yield block[offset:offset + size]
+
+    def spill(self):
+        """Merge the fingerprints in memory with the file into a new file"""
+        size = FINGERPRINT_BYTES
+        memory = sorted(key.to_bytes(size, 'big') for key in self.fingerprints)
+        new_file = tempfile.TemporaryFile(dir=self.directory)
+        buffer = bytearray()
+        for entry in heapq.merge(self.disk_entries(), memory):
+            buffer += entry
+            if len(buffer) >= self.BUFFER_BYTES:
+                new_file.write(buffer)
+                buffer.clear()
+        new_file.write(buffer)
+        new_file.flush()
+        self.close_file()
+        self.file = new_file
+        self.mapped = mmap.mmap(new_file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.spilled += len(memory)
+        self.fingerprints = set()
+        self.merges += 1
+
+    def close_file(self):
+        """Close (and so delete) the file"""
+        if self.mapped is not None:
+            self.mapped.close()
+            self.mapped = None
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def __contains__(self, key):
+        return key in self.fingerprints or (self.spilled > 0 and self.on_disk(key))
+
+    def __len__(self):
+        return len(self.parents)
+
+CLOSED_SETS = {
+    'states': StateClosedSet,
+    'compact': CompactClosedSet,
+    'disk': DiskClosedSet
+}
+
+def create_closed_set(name, engine, initial_state):
+    """
+    Create the closed set backend of a search: 'states', 'compact' or 'disk'
+    (BFS checks its layers against 'disk' with add_layer, DFS, UCS, A* and hill climbing
+    look its states up one at a time)
+    """
+    closed_set_class = CLOSED_SETS.get(name)
+    if closed_set_class is None:
+        raise ValueError(f"Unknown closed set: {name}")
+    return closed_set_class(engine, initial_state)
@@ -1,58 +1,31 @@
-import element
-import time
-from game_engine import GameEngine
-from game_renderer.game_renderer import GameRenderer
+from algorithms.search_algorithm import SearchAlgorithm
+from algorithms.closed_set import create_closed_set
 
-class DepthFirstSearch:
-    def __init__(self, level_file, algorithm_name="DFS"):
-        self.renderer = GameRenderer(cell_size=60)
-        self.engine = GameEngine()
-        self.level_file = level_file
-        self.algorithm_name = algorithm_name
-        self.states_explored = 0
-        self.generated_states = 0
+class DepthFirstSearch(SearchAlgorithm):
+    def __init__(self, level_file, algorithm_name="DFS", engine=None, closed_set="states"):
+        """closed_set: 'states', 'compact' or 'disk' (see algorithms.closed_set)"""
+        super().__init__(level_file, algorithm_name, engine)
+        self.closed_set = closed_set
 
-    def run(self):
-        self.initial_state = element.LevelLoader.load_level(self.level_file)
-        start_time = time.time()
-        status = [self.initial_state]
+    def search(self, initial_state):
+        self.initial_state = initial_state
+        visited = create_closed_set(self.closed_set, self.engine, initial_state)
+        record = visited.add(visited.key(initial_state), initial_state, None, None)
+        status = [(self.initial_state, record)]
+        self.frontier = status
+        self.visited = visited
         self.generated_states += 1
-        visited = set()
-        visited.add(self.initial_state)
-        player_win = False
 
         while status:
-            current_state = status.pop()
+            current_state, record = status.pop()
             self.states_explored += 1
+            self.search_checkpoint(current_state.path_cost)
             if self.engine.goal_test(current_state):
-                player_win = True
-                break
-            all_valid_move = self.engine.all_valid_moves(current_state)
-            if all_valid_move is None:
-                continue
-            for direction in all_valid_move:
-                add_state = self.engine.transition_model(current_state, direction)
-                if add_state is None:
-                    continue
-                if add_state not in visited:
-                    visited.add(add_state)
-                    status.append(add_state)
+                return visited.goal(current_state, record)
+            for direction, add_state in self.engine.expand(current_state):
+                key = visited.key(add_state)
+                if key not in visited:
+                    status.append((add_state, visited.add(key, add_state, record, direction)))
                     self.generated_states += 1
             # self.render_each_step(current_state)
-
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-
-        if player_win:
-            self.renderer.render_win_path(self.level_file,
-                                          self.algorithm_name,
-                                          self.states_explored,
-                                          self.generated_states,
-                                          current_state,
-                                          current_state.path_cost,
-                                          elapsed_time)
-
-    def render_each_step(self, state):
-        status_text = f"moves: {state.path_cost}"
-        self.renderer.render(state, status_text)
-    
\ No newline at end of file
+        return None
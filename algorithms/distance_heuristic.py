@@ -0,0 +1,129 @@
+import math
+from collections import deque
+from element import LAVA_WALL
+
+class DistanceHeuristic:
+    """
+    Lower bound on the moves left: the shortest walk from the player through
+    every remaining goal orb to the goal, with the real maze distances.
+
+    The distances are BFS maps from every orb and from the goal over the cells
+    that can never be walked on again: the walls (steam only adds walls) and the
+    lava walls (they are never removed). Everything else (blocks, numbered blocks,
+    lava, aqua) is treated as walkable, so the distances never overestimate.
+
+    The order of the orbs is exact (DP over the orb subsets) up to EXACT_ORB_LIMIT
+    orbs and a minimum spanning tree bound above that.
+    An orb or goal the player can never reach gives math.inf (a dead state).
+    """
+    EXACT_ORB_LIMIT = 10
+    # Built maps per level layout, shared by every search in the process
+    cache = {}
+    CACHE_SIZE = 32
+
+    @classmethod
+    def for_state(cls, state):
+        """Return the (cached) heuristic of the level the state is in"""
+        walls = frozenset(state.wall_positions).union(
+            position for position, element in state.elements.items() if element.flags & LAVA_WALL
+        )
+        key = (state.width, state.height, walls, state.goal_position, frozenset(state.goal_orb_position))
+        heuristic = cls.cache.get(key)
+        if heuristic is None:
+            if len(cls.cache) >= cls.CACHE_SIZE:
+                cls.cache.clear()
+            heuristic = cls.cache[key] = cls(state.width, state.height, walls,
+                                             state.goal_position, state.goal_orb_position)
+        return heuristic
+
+    def __init__(self, width, height, walls, goal_position, goal_orb_positions):
+        self.width = width
+        self.height = height
+        self.walls = walls
+        self.goal_position = goal_position
+        self.orbs = sorted(goal_orb_positions)
+        self.orb_bits = {position: 1 << index for index, position in enumerate(self.orbs)}
+        # distance maps: one {position: moves} per orb, then the goal
+        self.distances = [self.distance_map(position) for position in self.orbs]
+        self.goal_distances = self.distance_map(goal_position) if goal_position is not None else {}
+        count = len(self.orbs)
+        self.orb_to_orb = [[self.distances[i].get(orb, math.inf) for orb in self.orbs] for i in range(count)]
+        self.orb_to_goal = [self.distances[i].get(goal_position, math.inf) for i in range(count)]
+        self.tails = self.exact_tails() if count <= self.EXACT_ORB_LIMIT else None
+        self.spanning_trees = {}
+        self.values = {}
+
+    def distance_map(self, start):
+        """BFS moves from the start to every cell it connects to"""
+        distances = {start: 0}
+        frontier = deque([start])
+        while frontier:
+            x, y = position = frontier.popleft()
+            distance = distances[position] + 1
+            for near in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if (near not in distances and near not in self.walls
+                        and 0 <= near[0] < self.width and 0 <= near[1] < self.height):
+                    distances[near] = distance
+                    frontier.append(near)
+        return distances
+
+    def exact_tails(self):
+        """
+        tails[mask][i]: shortest walk from orb i through the other orbs of mask
+        (orb i included) to the goal, for every orb subset
+        """
+        count = len(self.orbs)
+        tails = [[math.inf] * count for _ in range(1 << count)]
+        for mask in range(1, 1 << count):
+            for i in range(count):
+                bit = 1 << i
+                if not mask & bit:
+                    continue
+                rest = mask ^ bit
+                if not rest:
+                    tails[mask][i] = self.orb_to_goal[i]
+                    continue
+                best = math.inf
+                for j in range(count):
+                    if rest & (1 << j):
+                        best = min(best, self.orb_to_orb[i][j] + tails[rest][j])
+                tails[mask][i] = best
+        return tails
+
+    def spanning_tree(self, mask):
+        """Weight of the minimum spanning tree over the orbs of mask and the goal (Prim)"""
+        weight = self.spanning_trees.get(mask)
+        if weight is not None:
+            return weight
+        nodes = [i for i in range(len(self.orbs)) if mask & (1 << i)]
+        # Start the tree from the goal
+        best = {i: self.orb_to_goal[i] for i in nodes}
+        weight = 0
+        while best:
+            i = min(best, key=best.get)
+            weight += best.pop(i)
+            for j in best:
+                if self.orb_to_orb[i][j] < best[j]:
+                    best[j] = self.orb_to_orb[i][j]
+        self.spanning_trees[mask] = weight
+        return weight
+
+    def __call__(self, player_position, goal_orb_positions):
+        """Lower bound on the moves from the player through the orbs left to the goal"""
+        mask = 0
+        for position in goal_orb_positions:
+            mask |= self.orb_bits[position]
+        key = (player_position, mask)
+        value = self.values.get(key)
+        if value is None:
+            value = self.values[key] = self.compute(player_position, mask)
+        return value
+
+    def compute(self, player_position, mask):
+        if not mask:
+            return self.goal_distances.get(player_position, math.inf)
+        orbs = [i for i in range(len(self.orbs)) if mask & (1 << i)]
+        if self.tails is not None:
+            return min(self.distances[i].get(player_position, math.inf) + self.tails[mask][i] for i in orbs)
+        first = min(self.distances[i].get(player_position, math.inf) for i in orbs)
+        return first + self.spanning_tree(mask)
@@ -1,75 +1,58 @@
-import time
 import element
-from queue import PriorityQueue
-from game_engine import GameEngine
-from game_renderer.game_renderer import GameRenderer
+from algorithms.search_algorithm import SearchAlgorithm
+from algorithms.open_list import create_open_list
+from algorithms.closed_set import create_closed_set
 
-class HillClimbing:
-    def __init__(self, level_file, algorithm_name="Hill Climbing"):
-        self.renderer = GameRenderer(cell_size=60)
-        self.engine = GameEngine()
-        self.level_file = level_file
-        self.algorithm_name = algorithm_name
-        self.states_explored = 0
-        self.generated_states = 0
+class HillClimbing(SearchAlgorithm):
+    def __init__(self, level_file, algorithm_name="Hill Climbing", engine=None, open_list="heap", closed_set="states"):
+        """
+        open_list: 'heap' or 'bucket' (see algorithms.open_list)
+        closed_set: 'states', 'compact' or 'disk' (see algorithms.closed_set)
+        """
+        super().__init__(level_file, algorithm_name, engine)
+        self.open_list = open_list
+        self.closed_set = closed_set
+        self.frontier = None
 
-    def run(self):
-        initial_state = element.LevelLoader.load_level(self.level_file)
+    def search(self, initial_state):
         initial_node = Node(state=initial_state, cost=self.heuristic(initial_state))
-        pq = PriorityQueue()
-        pq.put(initial_node)
+        visited = create_closed_set(self.closed_set, self.engine, initial_state)
+        initial_node.key = visited.key(initial_state)
+        pq = create_open_list(self.open_list)
+        self.frontier = pq
+        self.visited = visited
+        pq.push(initial_node.cost, initial_node)
         self.generated_states += 1
-        best_cost = {initial_node.state: initial_node.cost}
-        visited = set()
-        start_time = time.time()
-        goal_node = None
+        best_cost = {initial_node.key: initial_node.cost}
 
         while not pq.empty():
-            current_node = pq.get()
+            current_node = pq.pop()
             current_state = current_node.state
-            if current_state in visited:
+            if current_node.key in visited:
+                pq.stale += 1
                 continue
-            visited.add(current_state)
+            record = visited.add(current_node.key, current_state, current_node.parent, current_node.action)
             self.states_explored += 1
+            self.search_checkpoint(current_node.cost)
             if self.engine.goal_test(current_state):
-                goal_node = current_node
-                break
-            moves = self.engine.all_valid_moves(current_state)
-            if moves is None:
-                continue
-            for action in moves:
-                new_state = self.engine.transition_model(current_state, action)
-                if new_state is None:
-                    continue
+                return visited.goal(current_state, record)
+            for action, new_state in self.engine.expand(current_state):
                 heuristic = self.heuristic(new_state)
                 new_cost = current_node.cost + heuristic
-                if new_state not in best_cost or new_cost < best_cost[new_state]:
-                    best_cost[new_state] = new_cost
+                key = visited.key(new_state)
+                if key not in best_cost or new_cost < best_cost[key]:
+                    best_cost[key] = new_cost
                     new_node = Node(
                         state=new_state,
-                        parent=current_node,
+                        parent=record,
                         action=action,
-                        cost=new_cost
+                        cost=new_cost,
+                        key=key
                     )
-                    pq.put(new_node)
+                    pq.push(new_node.cost, new_node)
                     self.generated_states += 1
             # self.render_each_step(current_state)
-
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-
-        if goal_node is not None:
-            self.renderer.render_win_path(self.level_file,
-                                          self.algorithm_name,
-                                          self.states_explored,
-                                          self.generated_states,
-                                          goal_node.state,
-                                          goal_node.state.path_cost,
-                                          elapsed_time)
-
-    def render_each_step(self, state):
-        status_text = f"moves: {state.path_cost}"
-        self.renderer.render(state, status_text)
+        return None
 
     def heuristic(self, state):
         """
@@ -96,11 +79,16 @@ class HillClimbing:
         return heuristic
 
 class Node:
-    def __init__(self, state:element.GameState, parent=None, action=None, cost=0):
+    def __init__(self, state:element.GameState, parent=None, action=None, cost=0, key=None):
+        """
+        parent: the closed set record of the parent (or the parent node outside the closed set searches)
+        key: the closed set key of the state
+        """
         self.state = state
         self.parent = parent
         self.action = action
         self.cost = cost
+        self.key = key
 
     def __lt__(self, other):
         return self.cost < other.cost
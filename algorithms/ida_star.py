@@ -0,0 +1,121 @@
+import math
+from algorithms.a_star import AStar, Node
+from algorithms.closed_set import fingerprint
+
+class IDAStar(AStar):
+    """
+    Iterative deepening A*: depth first searches that only go through the nodes whose
+    estimate is within a threshold, the threshold then grows to the lowest estimate
+    that went over it. Only the current path (and the siblings of its nodes) is kept,
+    plus two tables bounded by memory_limit_mb.
+
+    The costs are the AStar costs (cost of a child = cost of its parent + heuristic
+    of the child + the new lava). The heuristic (moves left) drops by at most 1 per move,
+    so the states on the way to the goal add at least (h - 1) + (h - 2) + ... + 0 to the cost:
+    the estimate is cost + h * (h - 1) / 2, and the first goal found has the same
+    (optimal) cost as the one of AStar.
+
+    The transposition table maps a state to the lowest cost it was reached with
+    in the current iteration, a state reached again without a lower cost is skipped.
+    The bound table keeps, across the iterations, what a searched subtree proved about the
+    cost left from its state (the cost a move adds only depends on the two states), and
+    raises the estimate of that state when it is reached again.
+    Both tables are keyed by the 128-bit fingerprints of the states (see closed_set.fingerprint),
+    so an entry has the same size with every engine and doesn't keep its state alive.
+    They are cleared when they reach their size, which only costs some repeated work.
+    """
+    # A dict entry: the fingerprint int, the cost int and the dict slot
+    BYTES_PER_ENTRY = 120
+
+    def __init__(self, level_file, algorithm_name="IDA Star", engine=None, memory_limit_mb=64):
+        """memory_limit_mb: memory of the transposition and bound tables"""
+        super().__init__(level_file, algorithm_name, engine)
+        self.memory_limit_mb = memory_limit_mb
+        # Split the memory between the two tables
+        self.table_size = max(1, int(memory_limit_mb * 1024 * 1024) // self.BYTES_PER_ENTRY // 2)
+        self.bounds = {}
+        self.iterations = 0
+
+    def search(self, initial_state):
+        self.prepare_heuristic(initial_state)
+        heuristic = self.heuristic(initial_state)
+        if heuristic == math.inf:
+            return None
+        root = Node(state=initial_state, cost=heuristic, key=fingerprint(initial_state))
+        self.generated_states += 1
+        self.bounds = {}
+        threshold = self.estimate(root.cost, heuristic, root.key)
+        while threshold != math.inf:
+            self.iterations += 1
+            goal_state, threshold = self.bounded_search(root, threshold)
+            if goal_state is not None:
+                return goal_state
+        return None
+
+    def estimate(self, cost, heuristic, key):
+        """Lower bound on the cost of a goal reached through a node (key: the fingerprint of its state)"""
+        return cost + max(heuristic * (heuristic - 1) // 2, self.bounds.get(key, 0))
+
+    def remember(self, table, key, value):
+        if len(table) >= self.table_size:
+            table.clear()
+        table[key] = value
+
+    def bounded_search(self, root, threshold):
+        """
+        Depth first search of the nodes whose estimate is within the threshold,
+        return (the goal state or None, the lowest estimate over the threshold)
+        """
+        table = {root.key: root.cost}
+        next_threshold = math.inf
+        # [node, children left, lowest estimate over the threshold in its subtree]
+        stack = [[None, iter([root]), math.inf]]
+        self.frontier = stack
+        self.visited = table
+        while stack:
+            frame = stack[-1]
+            current_node = next(frame[1], None)
+            if current_node is None:
+                stack.pop()
+                if stack:
+                    # Every goal below this node costs at least frame[2]
+                    self.remember(self.bounds, frame[0].key, frame[2] - frame[0].cost)
+                    stack[-1][2] = min(stack[-1][2], frame[2])
+                continue
+            current_state = current_node.state
+            self.states_explored += 1
+            self.search_checkpoint(threshold)
+            if self.engine.goal_test(current_state):
+                return current_state, threshold
+            lowest = math.inf
+            children = []
+            for action, new_state in self.engine.expand(current_state):
+                heuristic = self.heuristic(new_state)
+                if heuristic == math.inf:
+                    continue
+                new_cost = heuristic + self.path_cost(current_node, new_state)
+                key = fingerprint(new_state)
+                estimate = self.estimate(new_cost, heuristic, key)
+                if estimate > threshold:
+                    next_threshold = min(next_threshold, estimate)
+                    lowest = min(lowest, estimate)
+                    continue
+                best_cost = table.get(key)
+                if best_cost is not None and best_cost <= new_cost:
+                    # Searched (or being searched) from a cheaper path:
+                    # no goal within the threshold below it from here
+                    lowest = min(lowest, threshold + 1)
+                    continue
+                self.remember(table, key, new_cost)
+                children.append((estimate, len(children), Node(
+                    state=new_state,
+                    parent=current_node,
+                    action=action,
+                    cost=new_cost,
+                    key=key
+                )))
+                self.generated_states += 1
+            # Most promising child first
+            children.sort()
+            stack.append([current_node, iter([node for _, _, node in children]), lowest])
+        return None, next_threshold
@@ -0,0 +1,100 @@
+import heapq
+import itertools
+from collections import deque
+
+class OpenList:
+    """
+    Priority queue of the nodes to explore, lowest priority first and
+    in insertion order between equal priorities (the searches stay deterministic).
+
+    No lock is taken (unlike queue.PriorityQueue), the open lists are only
+    used by the thread that searches.
+
+    Counters:
+    pushed / popped: nodes put in / taken out
+    stale: popped nodes the search skipped because they were already explored
+    (lazy deletion: a node is never removed, a better copy is pushed instead)
+    """
+    def __init__(self):
+        self.pushed = 0
+        self.popped = 0
+        self.stale = 0
+
+    def push(self, priority, node):
+        raise NotImplementedError
+
+    def pop(self):
+        """Remove and return the node with the lowest priority"""
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def empty(self):
+        return len(self) == 0
+
+class HeapOpenList(OpenList):
+    """Binary heap of (priority, insertion order, node) entries, any comparable priority"""
+    def __init__(self):
+        super().__init__()
+        self.heap = []
+        self.order = itertools.count()
+
+    def push(self, priority, node):
+        heapq.heappush(self.heap, (priority, next(self.order), node))
+        self.pushed += 1
+
+    def pop(self):
+        self.popped += 1
+        return heapq.heappop(self.heap)[2]
+
+    def __len__(self):
+        return len(self.heap)
+
+class BucketOpenList(OpenList):
+    """
+    Bucket queue for small non-negative integer priorities: one FIFO per priority,
+    push and pop are O(1) apart from skipping the empty buckets.
+    The searches never push a node cheaper than the last popped one,
+    so the lowest non-empty bucket only moves forward
+    """
+    def __init__(self):
+        super().__init__()
+        self.buckets = []
+        self.lowest = 0
+        self.size = 0
+
+    def push(self, priority, node):
+        if not isinstance(priority, int) or priority < 0:
+            raise ValueError(f"The bucket open list needs non-negative integer priorities, got {priority!r}")
+        while len(self.buckets) <= priority:
+            self.buckets.append(deque())
+        self.buckets[priority].append(node)
+        if priority < self.lowest:
+            self.lowest = priority
+        self.size += 1
+        self.pushed += 1
+
+    def pop(self):
+        if self.size == 0:
+            raise IndexError("pop from an empty open list")
+        while not self.buckets[self.lowest]:
+            self.lowest += 1
+        self.size -= 1
+        self.popped += 1
+        return self.buckets[self.lowest].popleft()
+
+    def __len__(self):
+        return self.size
+
+OPEN_LISTS = {
+    "heap": HeapOpenList,
+    "bucket": BucketOpenList
+}
+
+def create_open_list(name):
+    """Create an empty open list by name (see OPEN_LISTS)"""
+    open_list_class = OPEN_LISTS.get(name)
+    if open_list_class is None:
+        raise ValueError(f"Unknown open list: {name}")
+    return open_list_class()
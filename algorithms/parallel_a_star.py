@@ -0,0 +1,261 @@
+import os
+import math
+import heapq
+import queue
+import itertools
+import multiprocessing
+from algorithms.a_star import AStar, Node
+
+class ParallelAStar(AStar):
+    """
+    Hash Distributed A* (HDA*): every state is owned by worker process hash(state) % workers.
+    Each worker keeps its own open list and best cost table, expands the states it owns
+    and sends the children it doesn't own to their owner in batches.
+
+    The states travel without their parent (the pickled parent chain would grow with
+    every move), with the tuple of actions that led to them instead, and the solution
+    path is rebuilt at the end by replaying those actions from the initial state.
+
+    The costs are the AStar costs (the children never cost less than their parent),
+    so the first goal found is only an upper bound: the workers keep searching every
+    state cheaper than the best goal and a state reached again with a lower cost is reopened,
+    the returned goal has the same (optimal) cost as the one of the serial AStar.
+
+    Termination: workers report to the coordinator (this process) when they run out of
+    states, when all of them are idle the coordinator sends probe waves, and stops once
+    two consecutive waves find every worker idle with as many batches received as sent
+    and the same counts (no batch was in flight in between).
+    """
+    def __init__(self, level_file, algorithm_name="Parallel A Star", engine=None,
+                 workers=None, batch_size=64, compare_serial=False):
+        """
+        workers: worker processes (default: CPU count)
+        batch_size: children buffered per owner before they are sent
+        compare_serial: also solve with the serial AStar (twice the work) and report the speedup
+        """
+        super().__init__(level_file, algorithm_name, engine)
+        self.workers = workers or os.cpu_count()
+        self.batch_size = batch_size
+        self.compare_serial = compare_serial
+
+    def solve(self, time_limit=None):
+        result = super().solve(time_limit)
+        if self.compare_serial and result.status in ('solved', 'unsolved'):
+            serial_result = AStar(self.level_file, engine=self.engine).solve(time_limit)
+            if serial_result.status in ('solved', 'unsolved'):
+                result.serial_time = serial_result.search_time
+        return result
+
+    def search(self, initial_state):
+        if self.engine.goal_test(initial_state):
+            return initial_state
+        # Built before the workers start so that they all get the same distance maps
+        self.prepare_heuristic(initial_state)
+        initial_cost = self.heuristic(initial_state)
+        if initial_cost == math.inf:
+            return None
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue() for _ in range(self.workers)]
+        results = context.Queue()
+        # Only what the workers need: not this object (its telemetry file, engine caches...)
+        settings = (type(self.engine), self.engine.settings(), self.distances, self.batch_size)
+        processes = [
+            context.Process(target=hda_worker, args=(*settings, worker_id, inboxes, results), daemon=True)
+            for worker_id in range(self.workers)
+        ]
+        for process in processes:
+            process.start()
+        # The coordinator sends the first batch: the initial state
+        inboxes[hash(initial_state) % self.workers].put(
+            ('states', [(initial_state, (), initial_cost)]))
+        self.generated_states += 1
+        best_goal = None
+        try:
+            best_goal = self.coordinate(inboxes, results)
+        finally:
+            self.stop_workers(processes, inboxes, results)
+        if best_goal is None:
+            return None
+        return self.replay(initial_state, best_goal[1])
+
+    def coordinate(self, inboxes, results):
+        """Collect the goals and detect termination, return the best (cost, actions) or None"""
+        best_goal = None
+        idle_workers = set()
+        wave = 0
+        replies = None
+        previous_counts = None
+        while True:
+            self.search_checkpoint()
+            try:
+                message = results.get(timeout=0.05)
+            except queue.Empty:
+                # Still check for termination: a worker that receives a batch
+                # it doesn't push anything from stays idle and sends nothing
+                message = ('none',)
+            kind = message[0]
+            if kind == 'idle':
+                idle_workers.add(message[1])
+            elif kind == 'goal':
+                _, cost, actions = message
+                if best_goal is None or cost < best_goal[0]:
+                    best_goal = (cost, actions)
+                    for inbox in inboxes:
+                        inbox.put(('bound', cost))
+            elif kind == 'probe' and replies is not None and message[1] == wave:
+                _, _, worker_id, sent, received, idle = message
+                replies[worker_id] = (sent, received, idle)
+                if not idle:
+                    idle_workers.discard(worker_id)
+            if replies is not None and len(replies) == self.workers:
+                # + 1: the initial batch sent by the coordinator
+                sent = 1 + sum(reply[0] for reply in replies.values())
+                received = sum(reply[1] for reply in replies.values())
+                if all(reply[2] for reply in replies.values()) and sent == received:
+                    if previous_counts == (sent, received):
+                        return best_goal
+                    previous_counts = (sent, received)
+                    wave += 1
+                    replies = self.send_probes(inboxes, wave)
+                else:
+                    previous_counts = None
+                    replies = None
+            elif replies is None and len(idle_workers) == self.workers:
+                wave += 1
+                replies = self.send_probes(inboxes, wave)
+
+    def send_probes(self, inboxes, wave):
+        for inbox in inboxes:
+            inbox.put(('probe', wave))
+        return {}
+
+    def stop_workers(self, processes, inboxes, results):
+        """Stop the workers and add up their explored and generated states"""
+        for inbox in inboxes:
+            inbox.put(('stop',))
+        stopped = 0
+        while stopped < len(processes):
+            try:
+                message = results.get(timeout=5)
+            except queue.Empty:
+                break
+            if message[0] == 'stats':
+                _, explored, generated = message
+                self.states_explored += explored
+                self.generated_states += generated
+                stopped += 1
+        for process in processes:
+            process.join(1)
+            if process.is_alive():
+                process.terminate()
+                process.join()
+
+    def replay(self, initial_state, actions):
+        """Rebuild the goal state (with its parents) from the actions that lead to it"""
+        state = initial_state
+        for action in actions:
+            state = self.engine.transition_model(state, action)
+        return state
+
+def hda_worker(engine_class, engine_settings, distances, batch_size, worker_id, inboxes, results):
+    """
+    Search the states owned by this worker, see ParallelAStar
+    engine_class, engine_settings: the engine of the search, created again in this process
+    distances: the DistanceHeuristic of the level, built by the coordinator
+    """
+    engine = engine_class(**engine_settings)
+    # The AStar heuristic and path cost
+    algorithm = AStar(None, engine=engine)
+    algorithm.distances = distances
+    workers = len(inboxes)
+    inbox = inboxes[worker_id]
+    open_list = []
+    best_cost = {}
+    buffers = [[] for _ in range(workers)]
+    order = itertools.count()
+    bound = float('inf')
+    sent = received = explored = generated = steps = 0
+    reported_idle = False
+
+    def flush(owner):
+        nonlocal sent
+        inboxes[owner].put(('states', buffers[owner]))
+        buffers[owner] = []
+        sent += 1
+
+    def handle(message):
+        """Handle one inbox message, return False on stop"""
+        nonlocal bound, received
+        kind = message[0]
+        if kind == 'states':
+            received += 1
+            for state, actions, cost in message[1]:
+                if cost < bound and cost < best_cost.get(state, bound):
+                    best_cost[state] = cost
+                    heapq.heappush(open_list, (cost, next(order), state, actions))
+        elif kind == 'bound':
+            bound = min(bound, message[1])
+        elif kind == 'probe':
+            results.put(('probe', message[1], worker_id, sent, received, not open_list))
+        elif kind == 'stop':
+            results.put(('stats', explored, generated))
+            return False
+        return True
+
+    while True:
+        if not open_list:
+            for owner in range(workers):
+                if buffers[owner]:
+                    flush(owner)
+            if not reported_idle:
+                results.put(('idle', worker_id))
+                reported_idle = True
+            if not handle(inbox.get()):
+                return
+            continue
+        reported_idle = False
+        steps += 1
+        if steps % batch_size == 0:
+            # Pass the buffered children on and read the inbox every batch_size expansions
+            for owner in range(workers):
+                if buffers[owner]:
+                    flush(owner)
+            while True:
+                try:
+                    message = inbox.get_nowait()
+                except queue.Empty:
+                    break
+                if not handle(message):
+                    return
+            if not open_list:
+                continue
+        cost, _, state, actions = heapq.heappop(open_list)
+        if cost >= bound:
+            # Nothing left here can lead to a cheaper goal
+            open_list.clear()
+            continue
+        if cost > best_cost[state]:
+            # Reached again with a lower cost after it was pushed
+            continue
+        explored += 1
+        node = Node(state=state, cost=cost)
+        for action, new_state in engine.expand(state):
+            new_state.parent = None
+            new_cost = algorithm.heuristic(new_state) + algorithm.path_cost(node, new_state)
+            if new_cost >= bound:
+                continue
+            new_actions = actions + (action,)
+            generated += 1
+            if engine.goal_test(new_state):
+                bound = new_cost
+                results.put(('goal', new_cost, new_actions))
+                continue
+            owner = hash(new_state) % workers
+            if owner == worker_id:
+                if new_cost < best_cost.get(new_state, bound):
+                    best_cost[new_state] = new_cost
+                    heapq.heappush(open_list, (new_cost, next(order), new_state, new_actions))
+            else:
+                buffers[owner].append((new_state, new_actions, new_cost))
+                if len(buffers[owner]) >= batch_size:
+                    flush(owner)
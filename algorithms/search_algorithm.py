@@ -0,0 +1,197 @@
+import time
+from game_engine import GameEngine
+
+class SearchLimitExceeded(Exception):
+    """Raised inside a search that ran past its time limit"""
+
+class SolveResult:
+    """
+    What a headless solve returns: the solution and the search statistics
+    status: 'solved', 'unsolved' (the search space was exhausted),
+    'timeout', 'memory' or 'error' (with the message in error)
+    serial_time: search time of the serial version, for the parallel algorithms
+    cached: the solution comes from the solution cache (the statistics are the ones of its search)
+    """
+    def __init__(self, level_file, algorithm_name, solved, actions, path_cost,
+                 states_explored, generated_states, load_time, search_time, status=None, error=None,
+                 serial_time=None, cached=False):
+        self.level_file = level_file
+        self.algorithm_name = algorithm_name
+        self.solved = solved
+        self.status = status or ('solved' if solved else 'unsolved')
+        self.error = error
+        self.actions = actions
+        self.path_cost = path_cost
+        self.states_explored = states_explored
+        self.generated_states = generated_states
+        self.load_time = load_time
+        self.search_time = search_time
+        self.serial_time = serial_time
+        self.cached = cached
+
+    @classmethod
+    def from_dict(cls, data):
+        """Build a SolveResult back from to_dict() output"""
+        fields = ('level_file', 'algorithm_name', 'solved', 'actions', 'path_cost', 'states_explored',
+                  'generated_states', 'load_time', 'search_time', 'status', 'error', 'serial_time')
+        return cls(**{field: data.get(field) for field in fields})
+
+    @property
+    def nodes_per_second(self):
+        if self.search_time <= 0:
+            return 0.0
+        return self.states_explored / self.search_time
+
+    @property
+    def speedup(self):
+        """Serial search time / search time (None when there is no serial time)"""
+        if self.serial_time is None or self.search_time <= 0:
+            return None
+        return self.serial_time / self.search_time
+
+    def to_dict(self):
+        return {
+            'level_file': self.level_file,
+            'algorithm_name': self.algorithm_name,
+            'solved': self.solved,
+            'status': self.status,
+            'error': self.error,
+            'actions': self.actions,
+            'path_cost': self.path_cost,
+            'states_explored': self.states_explored,
+            'generated_states': self.generated_states,
+            'load_time': self.load_time,
+            'search_time': self.search_time,
+            'nodes_per_second': self.nodes_per_second,
+            'serial_time': self.serial_time,
+            'speedup': self.speedup,
+            'cached': self.cached
+        }
+
+    def __str__(self):
+        lines = [
+            "-"*100,
+            f"the level: {self.level_file}",
+            f"the algorithm: {self.algorithm_name}",
+            f"status: {self.status}" + (f" ({self.error})" if self.error else ""),
+            f"path cost: {self.path_cost}",
+            f"actions: {' '.join(self.actions)}",
+            f"load time: {self.load_time}",
+            f"time: {self.search_time}",
+            f"state explored: {self.states_explored}",
+            f"state generated: {self.generated_states}",
+            f"states per second: {self.nodes_per_second:.0f}",
+        ]
+        if self.cached:
+            lines.append("cached solution (replayed, not searched again)")
+        if self.serial_time is not None:
+            lines.append(f"serial time: {self.serial_time} (speedup {self.speedup:.2f}x)")
+        lines.append("-"*100)
+        return "\n".join(lines)
+
+class SearchAlgorithm:
+    """
+    Base class of the solvers: the search itself never touches pygame,
+    the renderer is only created by run() once a solution is found
+    """
+    def __init__(self, level_file, algorithm_name, engine=None):
+        self.engine = engine or GameEngine()
+        self.level_file = level_file
+        self.algorithm_name = algorithm_name
+        self.states_explored = 0
+        self.generated_states = 0
+        self.goal_state = None
+        self.renderer = None
+        self.deadline = None
+        # The open list and closed set of the running search, for the telemetry
+        self.frontier = None
+        self.visited = None
+        # SearchTelemetry that reports the progress of solve(), or None
+        self.telemetry = None
+
+    def search(self, initial_state):
+        """Search from the initial state, return the goal state or None"""
+        raise NotImplementedError
+
+    def search_checkpoint(self, bound=None):
+        """
+        Called by the search loops once per explored state (or search layer),
+        raise SearchLimitExceeded when the search runs past its time limit
+        bound: the depth or cost of the explored state (reported by the telemetry)
+        """
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchLimitExceeded("no solution within the time limit")
+        if self.telemetry is not None:
+            self.telemetry.tick(self, bound)
+
+    def solve(self, time_limit=None):
+        """
+        Load the level and search it without rendering, return a SolveResult
+        time_limit: seconds after which the search stops with the 'timeout' status
+        """
+        start_time = time.perf_counter()
+        initial_state = self.engine.load_level(self.level_file)
+        load_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        self.deadline = start_time + time_limit if time_limit is not None else None
+        status = None
+        if self.telemetry is not None:
+            self.telemetry.start(self)
+        try:
+            self.goal_state = self.search(initial_state)
+        except SearchLimitExceeded:
+            self.goal_state = None
+            status = 'timeout'
+        except KeyboardInterrupt:
+            if self.telemetry is not None:
+                self.telemetry.finish(self, 'interrupted')
+            raise
+        search_time = time.perf_counter() - start_time
+        solved = self.goal_state is not None
+        if self.telemetry is not None:
+            self.telemetry.finish(self, status or ('solved' if solved else 'unsolved'))
+        return SolveResult(
+            level_file=self.level_file,
+            algorithm_name=self.algorithm_name,
+            solved=solved,
+            actions=self.path_actions(self.goal_state) if solved else [],
+            path_cost=self.goal_state.path_cost if solved else None,
+            states_explored=self.states_explored,
+            generated_states=self.generated_states,
+            load_time=load_time,
+            search_time=search_time,
+            status=status
+        )
+
+    def run(self):
+        """Solve the level and show the solution path"""
+        result = self.solve()
+        if result.solved:
+            self.get_renderer().render_win_path(self.level_file,
+                                                self.algorithm_name,
+                                                self.states_explored,
+                                                self.generated_states,
+                                                self.goal_state,
+                                                result.path_cost,
+                                                result.search_time)
+        return result
+
+    def path_actions(self, state):
+        """Return the actions from the initial state to the given state"""
+        actions = []
+        while state.parent is not None:
+            actions.append(state.action)
+            state = state.parent
+        actions.reverse()
+        return actions
+
+    def get_renderer(self):
+        if self.renderer is None:
+            # Imported here so that searching never imports or initialises pygame
+            from game_renderer.game_renderer import GameRenderer
+            self.renderer = GameRenderer(cell_size=60)
+        return self.renderer
+
+    def render_each_step(self, state):
+        status_text = f"moves: {state.path_cost}"
+        self.get_renderer().render(state, status_text)
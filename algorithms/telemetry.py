@@ -0,0 +1,78 @@
+import sys
+import json
+import time
+from process_memory import rss_mb
+
+class SearchTelemetry:
+    """
+    Progress of a running search as JSON lines, one record per line:
+    {"event": "start" | "progress" | "end", "time": seconds since the start,
+     "explored", "generated", "rate": states explored per second since the previous record,
+     "open": open list size, "closed": closed set size, "bound": depth (BFS, DFS) or
+     cost (UCS, A*, hill climbing) of the state being explored, or the IDA* threshold,
+     "rss_mb", and the status of the end record}
+
+    The searches call tick() from search_checkpoint() with every explored state (or layer),
+    a progress record is written once every states have been explored or interval seconds
+    have passed since the previous record, a tick in between only compares two numbers.
+    """
+    def __init__(self, stream, every=50000, interval=1.0):
+        self.stream = stream
+        self.every = every
+        self.interval = interval
+        self.start_time = None
+        self.last_time = None
+        self.last_explored = 0
+        self.next_explored = every
+        self.next_time = None
+
+    @classmethod
+    def open(cls, path, every=50000, interval=1.0):
+        """Write the records to a file ('-': standard error)"""
+        stream = sys.stderr if path == '-' else open(path, 'w')
+        return cls(stream, every, interval)
+
+    def close(self):
+        if self.stream is not sys.stderr:
+            self.stream.close()
+
+    def start(self, algorithm):
+        self.start_time = self.last_time = time.perf_counter()
+        self.last_explored = algorithm.states_explored
+        self.next_explored = self.last_explored + self.every
+        self.next_time = self.start_time + self.interval
+        self.write(algorithm, 'start', self.start_time, None,
+                   level=algorithm.level_file, algorithm=algorithm.algorithm_name)
+
+    def tick(self, algorithm, bound):
+        now = time.perf_counter()
+        if algorithm.states_explored < self.next_explored and now < self.next_time:
+            return
+        self.write(algorithm, 'progress', now, bound)
+
+    def finish(self, algorithm, status):
+        self.write(algorithm, 'end', time.perf_counter(), None, status=status)
+
+    def write(self, search, event, now, bound, **fields):
+        explored = search.states_explored
+        elapsed = now - self.last_time
+        record = {
+            'event': event,
+            'time': round(now - self.start_time, 3),
+            'explored': explored,
+            'generated': search.generated_states,
+            'rate': round((explored - self.last_explored) / elapsed) if elapsed > 0 else 0,
+            'open': len(search.frontier) if search.frontier is not None else None,
+            'closed': len(search.visited) if search.visited is not None else None,
+            'bound': bound,
+            'rss_mb': rss_mb()
+        }
+        if record['rss_mb'] is not None:
+            record['rss_mb'] = round(record['rss_mb'], 1)
+        record.update(fields)
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+        self.last_time = now
+        self.last_explored = explored
+        self.next_explored = explored + self.every
+        self.next_time = now + self.interval
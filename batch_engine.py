@@ -0,0 +1,132 @@
+try:
+    import numpy as np
+except ImportError:
+    np = None
+from bitboard_engine import BitboardEngine
+
+class BatchEngine(BitboardEngine):
+    """
+    Steps the numbered blocks, lava and aqua of many boards at once
+    on a stacked boolean grid array of shape (N, height, width, layers)
+    with the numbered block moves in an int array of shape (N, height, width).
+    The rules are the same as GameEngine / BitboardEngine, written with
+    shifted-array neighbourhood operations instead of per-cell loops
+    """
+    LAYERS = ('wall', 'lava', 'aqua', 'block', 'lava_wall', 'goal_orb', 'goal', 'player', 'numbered')
+    WALL, LAVA, AQUA, BLOCK, LAVA_WALL, GOAL_ORB, GOAL, PLAYER, NUMBERED = range(len(LAYERS))
+
+    def __init__(self, fluid_pruning=False):
+        if np is None:
+            raise ImportError("The batch engine needs numpy: pip install numpy")
+        super().__init__(fluid_pruning=fluid_pruning)
+
+    def encode(self, boards):
+        """Stack the layers of same-sized bitboard states into (grids, moves) arrays"""
+        count = len(boards)
+        width, height = boards[0].width, boards[0].height
+        cells = width * height
+        size = (cells + 7) // 8
+        grids = np.zeros((count, height, width, len(self.LAYERS)), dtype=bool)
+        for layer, name in enumerate(self.LAYERS[:self.NUMBERED]):
+            data = b''.join(getattr(board, name).to_bytes(size, 'little') for board in boards)
+            bits = np.unpackbits(np.frombuffer(data, dtype=np.uint8).reshape(count, size), axis=1, bitorder='little')
+            grids[..., layer] = bits[:, :cells].reshape(count, height, width)
+        moves = np.zeros((count, height, width), dtype=np.int32)
+        flat_moves = moves.reshape(count, cells)
+        for row, board in enumerate(boards):
+            for index, moves_remaining in board.numbered:
+                flat_moves[row, index] = moves_remaining
+        grids[..., self.NUMBERED] = moves > 0
+        return grids, moves
+
+    def decode(self, grids, moves, boards):
+        """Write the layers of (grids, moves) back into the boards they were encoded from"""
+        count = len(boards)
+        cells = boards[0].width * boards[0].height
+        for layer, name in enumerate(self.LAYERS[:self.NUMBERED]):
+            packed = np.packbits(grids[..., layer].reshape(count, cells), axis=1, bitorder='little')
+            for board, row in zip(boards, packed):
+                setattr(board, name, int.from_bytes(row.tobytes(), 'little'))
+        rows, indexes = np.nonzero(moves.reshape(count, cells) > 0)
+        numbered = [[] for _ in range(count)]
+        for row, index, moves_remaining in zip(rows.tolist(), indexes.tolist(), moves.reshape(count, cells)[rows, indexes].tolist()):
+            numbered[row].append((index, moves_remaining))
+        for board, table in zip(boards, numbered):
+            board.numbered = tuple(table)
+            board.numbered_mask = 0
+            for index, _ in table:
+                board.numbered_mask |= 1 << index
+            board._hash = None
+        return boards
+
+    def neighbours_batch(self, mask):
+        """Return the cells up, down, left and right of every cell of an (N, height, width) mask"""
+        reached = np.zeros_like(mask)
+        reached[:, 1:, :] |= mask[:, :-1, :]
+        reached[:, :-1, :] |= mask[:, 1:, :]
+        reached[:, :, 1:] |= mask[:, :, :-1]
+        reached[:, :, :-1] |= mask[:, :, 1:]
+        return reached
+
+    def fluid_step(self, grids, moves):
+        """
+        Count down the numbered blocks and spread lava and aqua (with steam)
+        for every board right after its player moved, return the new (grids, moves)
+        """
+        grids = grids.copy()
+        wall, lava, aqua, block = (grids[..., layer] for layer in (self.WALL, self.LAVA, self.AQUA, self.BLOCK))
+        lava_wall, goal_orb, goal, player = (grids[..., layer] for layer in (self.LAVA_WALL, self.GOAL_ORB, self.GOAL, self.PLAYER))
+        source_aqua = aqua.copy()
+        # Decrement the numbered blocks and drop the ones that hit zero
+        numbered = grids[..., self.NUMBERED]
+        moves = np.where(numbered, moves - 1, 0)
+        numbered[...] = moves > 0
+        moves[~numbered] = 0
+        # Lava spreads into empty cells, over the player, and under the special properties
+        blocked = wall | block | numbered
+        special = lava_wall | goal_orb | goal
+        reached = self.neighbours_batch(lava)
+        open_cells = ~blocked & ~lava
+        fresh = reached & ((lava & player) | (open_cells & ~special & (~aqua | player)))
+        converted = reached & open_cells & special
+        lava |= fresh | converted
+        aqua &= ~(fresh | converted)
+        lava_wall &= ~fresh
+        goal_orb &= ~fresh
+        goal &= ~fresh
+        player &= ~fresh
+        # Aqua spreads into empty cells, under the special properties and the player,
+        # and turns plain lava into walls (steam)
+        reached = self.neighbours_batch(source_aqua) & ~(blocked | aqua)
+        keep_properties = reached & (lava_wall | goal_orb | goal | player)
+        rest = reached & ~keep_properties
+        steam = rest & lava
+        aqua |= keep_properties | (rest & ~lava)
+        lava &= ~(keep_properties | steam)
+        wall |= steam
+        return grids, moves
+
+    def expand_layer(self, states):
+        """
+        Expand every state of a search layer at once,
+        return the (parent, action, child) triples in state then direction order
+        without the children that can't be won anymore
+        """
+        boards = []
+        for state in states:
+            if not state.player:
+                continue
+            for action in self.directions:
+                new_position = self.target_position(state, action)
+                if new_position is not None:
+                    boards.append(self.move_player(state, action, new_position))
+        if boards:
+            grids, moves = self.fluid_step(*self.encode(boards))
+            self.decode(grids, moves, boards)
+        triples = []
+        for board in boards:
+            if self.is_dead_state(board.parent, board):
+                self.pruned_states += 1
+            else:
+                triples.append((board.parent, board.action, board))
+        return triples
@@ -0,0 +1,122 @@
+import os
+import time
+import multiprocessing
+from collections import deque
+from multiprocessing.connection import wait
+from algorithms.search_algorithm import SolveResult
+from process_memory import limit_memory
+
+# Seconds a job may run past its time limit before its worker is killed
+TIMEOUT_GRACE = 5.0
+
+def failed_result(level_file, algorithm, status, error=None):
+    return SolveResult(
+        level_file=level_file,
+        algorithm_name=algorithm,
+        solved=False,
+        actions=[],
+        path_cost=None,
+        states_explored=0,
+        generated_states=0,
+        load_time=0.0,
+        search_time=0.0,
+        status=status,
+        error=error
+    )
+
+def solve_job(level_file, algorithm, engine, time_limit):
+    """Solve one (level, algorithm) job inside a worker process"""
+    from solver import solve
+    try:
+        return solve(level_file, algorithm, engine, time_limit)
+    except MemoryError:
+        return failed_result(level_file, algorithm, 'memory', "ran out of memory")
+    except Exception as e:
+        return failed_result(level_file, algorithm, 'error', str(e))
+
+def run_job(connection, level_file, algorithm, engine, time_limit, memory_limit_mb, level_cache):
+    """Solve one job in its worker process and send the SolveResult back"""
+    limit_memory(memory_limit_mb)
+    if level_cache:
+        from element import LevelLoader
+        from level_format import LevelCache
+        LevelLoader.cache = LevelCache()
+    connection.send(solve_job(level_file, algorithm, engine, time_limit))
+    connection.close()
+
+def solve_many(jobs, engine="dict", workers=None, time_limit=None, memory_limit_mb=None, ordered=False,
+               level_cache=False):
+    """
+    Solve (level_file, algorithm) jobs on up to workers processes at a time and
+    yield a SolveResult per job, in job order when ordered is True
+    and as soon as each one finishes otherwise.
+
+    Every job runs in a fresh worker process, so a job that crashes or hangs
+    never takes another job down or keeps its slot.
+    time_limit: seconds per job, the search stops itself with the 'timeout' status;
+    a worker still running TIMEOUT_GRACE seconds after that (counted from the start
+    of its job) is killed
+    memory_limit_mb: address space cap of every worker process
+    level_cache: load the CSV levels through the compiled level cache (see element.LevelLoader)
+    Closing the generator (or Ctrl+C) kills the running jobs and drops the others
+    """
+    jobs = list(jobs)
+    workers = workers or os.cpu_count()
+    context = multiprocessing.get_context()
+    pending = deque(enumerate(jobs))
+    # receiving end of the job's pipe -> (job index, process, deadline)
+    running = {}
+    finished = {}
+    next_index = 0
+    try:
+        while pending or running:
+            while pending and len(running) < workers:
+                index, (level_file, algorithm) = pending.popleft()
+                receiver, sender = context.Pipe(duplex=False)
+                process = context.Process(target=run_job, args=(sender, level_file, algorithm, engine,
+                                                                time_limit, memory_limit_mb, level_cache))
+                process.start()
+                sender.close()
+                deadline = time.monotonic() + time_limit + TIMEOUT_GRACE if time_limit is not None else None
+                running[receiver] = (index, process, deadline)
+            deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+            timeout = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+            for receiver in wait(list(running), timeout):
+                index, process, _ = running.pop(receiver)
+                finished[index] = job_result(receiver, process, *jobs[index])
+            now = time.monotonic()
+            for receiver, (index, process, deadline) in list(running.items()):
+                if deadline is not None and now >= deadline:
+                    del running[receiver]
+                    stop_worker(receiver, process)
+                    finished[index] = failed_result(*jobs[index], 'timeout', "the worker did not stop in time and was killed")
+            if ordered:
+                while next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+            else:
+                for index in sorted(finished):
+                    yield finished.pop(index)
+    finally:
+        for receiver, (_, process, _) in running.items():
+            stop_worker(receiver, process)
+
+def job_result(receiver, process, level_file, algorithm):
+    """Read the result of a finished job, a worker that died without one gives a failed SolveResult"""
+    try:
+        result = receiver.recv()
+    except (EOFError, OSError):
+        # e.g. killed by the system when it ran out of memory
+        result = None
+    receiver.close()
+    process.join()
+    if result is None:
+        return failed_result(level_file, algorithm, 'error', f"the worker exited with code {process.exitcode}")
+    return result
+
+def stop_worker(receiver, process):
+    """Kill a worker process that is still running"""
+    receiver.close()
+    if process.is_alive():
+        process.kill()
+    process.join()
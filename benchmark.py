@@ -0,0 +1,198 @@
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import sys
+import time
+from algorithm_mode import ALGORITHMS, ENGINES, OPEN_LIST_ALGORITHMS, CLOSED_SET_ALGORITHMS
+from algorithms.open_list import OPEN_LISTS
+from algorithms.closed_set import CLOSED_SETS
+from element import LevelLoader
+from process_memory import limit_memory, peak_rss_mb
+
+CSV_FIELDS = [
+    'level', 'algorithm', 'engine', 'status', 'runs', 'wall_time', 'wall_time_min', 'wall_time_max',
+    'states_explored', 'generated_states', 'nodes_per_second', 'peak_rss_mb',
+    'solution_length', 'path_cost'
+]
+
+def algorithm_names():
+    """One name per algorithm class of AlgorithmMode (the first alias)"""
+    names = {}
+    for name, algorithm_class in ALGORITHMS.items():
+        names.setdefault(algorithm_class, name)
+    return list(names.values())
+
+def run_job(connection, level_file, algorithm, engine, memory_limit_mb, open_list=None, closed_set=None):
+    """Solve one level in this (child) process and send the result back"""
+    from solver import solve
+    try:
+        limit_memory(memory_limit_mb)
+        result = solve(level_file, algorithm, engine, open_list=open_list, closed_set=closed_set).to_dict()
+        result['status'] = 'ok' if result['solved'] else 'unsolved'
+    except MemoryError:
+        result = {'status': 'memory'}
+    except Exception as e:
+        result = {'status': 'error', 'error': str(e)}
+    result['peak_rss_mb'] = peak_rss_mb()
+    connection.send(result)
+    connection.close()
+
+def run_once(level_file, algorithm, engine, timeout, memory_limit_mb, open_list=None, closed_set=None):
+    """Run one solve in a fresh process, kill it after the timeout"""
+    context = multiprocessing.get_context('spawn')
+    receiver, sender = context.Pipe(duplex=False)
+    process = context.Process(target=run_job, args=(sender, level_file, algorithm, engine, memory_limit_mb,
+                                                    open_list, closed_set))
+    start_time = time.perf_counter()
+    process.start()
+    sender.close()
+    result = None
+    if receiver.poll(timeout):
+        try:
+            result = receiver.recv()
+        except EOFError:
+            result = None
+    wall_time = time.perf_counter() - start_time
+    if result is None:
+        status = 'timeout' if process.is_alive() else 'crashed'
+        result = {'status': status}
+    process.join(1)
+    if process.is_alive():
+        process.kill()
+        process.join()
+    result['process_time'] = wall_time
+    return result
+
+def summarize(level_file, algorithm, engine, runs):
+    """Aggregate the repeated runs of one (level, algorithm) pair"""
+    level = os.path.basename(level_file)
+    ok_runs = [run for run in runs if run['status'] in ('ok', 'unsolved')]
+    if not ok_runs:
+        return {'level': level, 'algorithm': algorithm, 'engine': engine,
+                'status': runs[-1]['status'], 'runs': len(runs)}
+    times = [run['load_time'] + run['search_time'] for run in ok_runs]
+    rss = [run['peak_rss_mb'] for run in ok_runs if run.get('peak_rss_mb') is not None]
+    last = ok_runs[-1]
+    wall_time = statistics.median(times)
+    return {
+        'level': level,
+        'algorithm': algorithm,
+        'engine': engine,
+        'status': last['status'],
+        'runs': len(ok_runs),
+        'wall_time': wall_time,
+        'wall_time_min': min(times),
+        'wall_time_max': max(times),
+        'states_explored': last['states_explored'],
+        'generated_states': last['generated_states'],
+        'nodes_per_second': last['states_explored'] / wall_time if wall_time > 0 else 0.0,
+        'peak_rss_mb': max(rss) if rss else None,
+        'solution_length': len(last['actions']),
+        'path_cost': last['path_cost']
+    }
+
+def compare_with_baseline(results, baseline, threshold):
+    """
+    Return the regressions against a baseline benchmark:
+    slower by more than the threshold, more states explored, or no longer solved
+    """
+    previous = {(entry['level'], entry['algorithm'], entry['engine']): entry for entry in baseline['results']}
+    regressions = []
+    for entry in results:
+        old = previous.get((entry['level'], entry['algorithm'], entry['engine']))
+        if old is None:
+            continue
+        if old['status'] == 'ok' and entry['status'] != 'ok':
+            regressions.append((entry, f"status {old['status']} -> {entry['status']}"))
+            continue
+        if entry['status'] != 'ok' or old['status'] != 'ok':
+            continue
+        if entry['wall_time'] > old['wall_time'] * (1 + threshold):
+            regressions.append((entry, f"time {old['wall_time']:.3f}s -> {entry['wall_time']:.3f}s "
+                                       f"(+{(entry['wall_time'] / old['wall_time'] - 1) * 100:.0f}%)"))
+        if entry['states_explored'] > old['states_explored'] * (1 + threshold):
+            regressions.append((entry, f"states explored {old['states_explored']} -> {entry['states_explored']}"))
+    return regressions
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Benchmark every algorithm on every level")
+    parser.add_argument("--levels", nargs="+", default=["levels/*.csv"], help="level files or glob patterns")
+    parser.add_argument("--algorithms", nargs="+", default=algorithm_names(), help="algorithm names")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="dict")
+    parser.add_argument("--open-list", choices=sorted(OPEN_LISTS), default=None,
+                        help="priority queue of UCS, A* and hill climbing (default: heap)")
+    parser.add_argument("--closed-set", choices=sorted(CLOSED_SETS), default=None,
+                        help="visited states of BFS, DFS, UCS, A* and hill climbing (default: states)")
+    parser.add_argument("--repeats", type=int, default=3, help="measured runs per level and algorithm")
+    parser.add_argument("--timeout", type=float, default=60.0, help="seconds before a run is killed")
+    parser.add_argument("--memory-limit", type=float, default=None, help="address space cap per run in MB")
+    parser.add_argument("--output", default="bench_output.json", help="JSON results file")
+    parser.add_argument("--csv", default=None, help="also write the results as CSV")
+    parser.add_argument("--baseline", default=None, help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown before a regression (0.10 = 10%%)")
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    results = []
+    for level_file in LevelLoader.level_files(args.levels):
+        for algorithm in args.algorithms:
+            # BFS, DFS, ... have no open list to choose
+            algorithm_class = ALGORITHMS.get(algorithm.lower())
+            open_list = args.open_list if algorithm_class in OPEN_LIST_ALGORITHMS else None
+            closed_set = args.closed_set if algorithm_class in CLOSED_SET_ALGORITHMS else None
+            runs = []
+            # Every run is a cold start in a fresh process: nothing (imports, heuristic
+            # tables) is carried over from one run to the next
+            for _ in range(args.repeats):
+                run = run_once(level_file, algorithm, args.engine, args.timeout, args.memory_limit,
+                               open_list, closed_set)
+                runs.append(run)
+                if run['status'] not in ('ok', 'unsolved'):
+                    # Don't repeat runs that time out or fail
+                    break
+            entry = summarize(level_file, algorithm, args.engine, runs)
+            results.append(entry)
+            if entry['status'] in ('ok', 'unsolved'):
+                print(f"{entry['level']:<12} {algorithm:<8} {entry['status']:<8} {entry['wall_time']:8.3f}s "
+                      f"{entry['states_explored']:>9} states {entry['nodes_per_second']:>9.0f}/s "
+                      f"cost {entry['path_cost']}")
+            else:
+                print(f"{entry['level']:<12} {algorithm:<8} {entry['status']}")
+    report = {
+        'metadata': {
+            'created': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'engine': args.engine,
+            'open_list': args.open_list,
+            'closed_set': args.closed_set,
+            'repeats': args.repeats,
+            'timeout': args.timeout,
+            'memory_limit_mb': args.memory_limit
+        },
+        'results': results
+    }
+    with open(args.output, 'w') as file:
+        json.dump(report, file, indent=2)
+    if args.csv:
+        with open(args.csv, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=CSV_FIELDS, extrasaction='ignore')
+            writer.writeheader()
+            writer.writerows(results)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        regressions = compare_with_baseline(results, baseline, args.threshold)
+        for entry, reason in regressions:
+            print(f"REGRESSION {entry['level']} {entry['algorithm']}: {reason}")
+        if regressions:
+            sys.exit(1)
+        print("no regressions against the baseline")
+
+if __name__ == '__main__':
+    main()
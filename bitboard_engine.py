@@ -0,0 +1,379 @@
+from element import GameElement, ElementType, LevelLoader, pack_layers, PROPERTY_FLAGS
+from game_engine import GameEngine
+
+class BitboardState:
+    """
+    A game state where every layer is one int bitmask over width * height cells
+    (bit index = y * width + x) and numbered blocks live in a small side table
+    of (index, moves_remaining) pairs sorted by index
+    """
+    __slots__ = (
+        'width', 'height', 'wall', 'lava', 'aqua', 'block', 'lava_wall',
+        'goal_orb', 'goal', 'player', 'numbered', 'numbered_mask',
+        'parent', 'action', 'path_cost', '_hash'
+    )
+
+    def __init__(self, width, height, wall=0, lava=0, aqua=0, block=0, lava_wall=0,
+                 goal_orb=0, goal=0, player=0, numbered=(), parent=None, action=None, path_cost=0):
+        self.width = width
+        self.height = height
+        self.wall = wall
+        self.lava = lava
+        self.aqua = aqua
+        self.block = block
+        self.lava_wall = lava_wall
+        self.goal_orb = goal_orb
+        self.goal = goal
+        self.player = player
+        self.numbered = numbered
+        self.numbered_mask = 0
+        for index, _ in numbered:
+            self.numbered_mask |= 1 << index
+        self.parent = parent
+        self.action = action
+        self.path_cost = path_cost
+        self._hash = None
+
+    @classmethod
+    def from_game_state(cls, state):
+        """Build the bitboard representation of an element based GameState"""
+        width = state.width
+        layers = {
+            'wall': 0, 'lava': 0, 'aqua': 0, 'block': 0,
+            'lava_wall': 0, 'goal_orb': 0, 'goal': 0, 'player': 0
+        }
+        numbered = []
+        type_layers = {
+            ElementType.WALL: 'wall',
+            ElementType.LAVA: 'lava',
+            ElementType.AQUA: 'aqua',
+            ElementType.MOVABLE_BLOCK: 'block'
+        }
+        for (x, y), element in state.elements.items():
+            bit = 1 << (y * width + x)
+            layer = type_layers.get(element.type)
+            if layer:
+                layers[layer] |= bit
+            elif element.type == ElementType.NUMBERED_BLOCK:
+                numbered.append((y * width + x, element.moves_remaining or 0))
+            for prop, flag in PROPERTY_FLAGS.items():
+                if element.flags & flag:
+                    layers[prop] |= bit
+        # The walls of the static layer are not in the elements
+        for x, y in state.wall_positions:
+            layers['wall'] |= 1 << (y * width + x)
+        return cls(state.width, state.height, numbered=tuple(sorted(numbered)), **layers)
+
+    def positions(self, mask):
+        """Yield the (x, y) position of every set bit in the mask"""
+        width = self.width
+        while mask:
+            low_bit = mask & -mask
+            index = low_bit.bit_length() - 1
+            yield (index % width, index // width)
+            mask ^= low_bit
+
+    def position(self, mask):
+        """Return the (x, y) position of the highest set bit or None for an empty mask"""
+        if not mask:
+            return None
+        index = mask.bit_length() - 1
+        return (index % self.width, index // self.width)
+
+    @property
+    def player_position(self):
+        return self.position(self.player)
+
+    @property
+    def goal_position(self):
+        return self.position(self.goal)
+
+    @property
+    def goal_orb_position(self):
+        return set(self.positions(self.goal_orb))
+
+    @property
+    def lava_positions(self):
+        return set(self.positions(self.lava))
+
+    @property
+    def wall_positions(self):
+        return frozenset(self.positions(self.wall))
+
+    @property
+    def aqua_positions(self):
+        return set(self.positions(self.aqua))
+
+    @property
+    def movable_blocks(self):
+        return set(self.positions(self.block))
+
+    @property
+    def numbered_blocks(self):
+        width = self.width
+        return {(index % width, index // width): moves for index, moves in self.numbered}
+
+    @property
+    def lava_count(self):
+        return bin(self.lava).count('1')
+
+    @property
+    def elements(self):
+        """Rebuild the elements dict (used by the renderer)"""
+        elements = {}
+        layer_types = (
+            (self.wall, ElementType.WALL),
+            (self.lava, ElementType.LAVA),
+            (self.aqua, ElementType.AQUA),
+            (self.block, ElementType.MOVABLE_BLOCK)
+        )
+        for mask, element_type in layer_types:
+            for position in self.positions(mask):
+                elements[position] = GameElement(element_type, position)
+        for position, moves in self.numbered_blocks.items():
+            elements[position] = GameElement(ElementType.NUMBERED_BLOCK, position, {'moves_remaining': moves})
+        for prop in ('lava_wall', 'goal_orb', 'goal', 'player'):
+            for position in self.positions(getattr(self, prop)):
+                if position not in elements:
+                    elements[position] = GameElement(ElementType.EMPTY, position)
+                elements[position].properties[prop] = True
+        return elements
+
+    def packed(self):
+        """The features compared by __eq__ as bytes (see pack_layers)"""
+        return pack_layers(self.width, self.height, (
+            self.player, self.goal, self.goal_orb, self.lava, self.aqua, self.block
+        ), self.numbered)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash((
+                self.player, self.goal, self.goal_orb, self.lava,
+                self.aqua, self.block, self.numbered
+            ))
+        return self._hash
+
+    def __eq__(self, other):
+        if not isinstance(other, BitboardState):
+            return False
+        return (
+            self.player == other.player and
+            self.goal == other.goal and
+            self.goal_orb == other.goal_orb and
+            self.lava == other.lava and
+            self.aqua == other.aqua and
+            self.block == other.block and
+            self.numbered == other.numbered
+        )
+
+class BitboardEngine(GameEngine):
+    """
+    The same rules as GameEngine applied with whole-layer bit operations
+    on BitboardState instead of per-element dict updates
+    """
+    def __init__(self, fluid_pruning=False):
+        super().__init__(fluid_pruning=fluid_pruning)
+        self._board_masks = {}
+
+    def settings(self):
+        return {'fluid_pruning': self.fluid_pruning}
+
+    def load_level(self, level_file):
+        return BitboardState.from_game_state(LevelLoader.load_level(level_file))
+
+    def board_masks(self, width, height):
+        """
+        Return (full, not_first_column, not_last_column) masks for a board size,
+        they stop the shifted layers from wrapping around the row edges
+        """
+        masks = self._board_masks.get((width, height))
+        if masks is None:
+            full = (1 << (width * height)) - 1
+            first_column = 0
+            for y in range(height):
+                first_column |= 1 << (y * width)
+            last_column = first_column << (width - 1)
+            masks = (full, full & ~first_column, full & ~last_column)
+            self._board_masks[(width, height)] = masks
+        return masks
+
+    def neighbours(self, mask, width, height):
+        """Return the cells up, down, left and right of every cell in the mask"""
+        full, not_first_column, not_last_column = self.board_masks(width, height)
+        return (
+            ((mask << 1) & not_first_column)
+            | ((mask >> 1) & not_last_column)
+            | ((mask << width) & full)
+            | (mask >> width)
+        )
+
+    def transition_model(self, state, action):
+        """
+        Apply an action to the current state and return a new state
+        Returns None if the move is invalid
+        """
+        if action not in self.directions or not state.player:
+            return None
+        new_position = self.target_position(state, action)
+        if new_position is None:
+            return None
+        return self.apply_move(state, action, new_position)
+
+    def target_position(self, state, action):
+        """Return the bit of the cell the player moves into or None if the move is invalid"""
+        dx, dy = self.directions[action]
+        width, height = state.width, state.height
+        index = state.player.bit_length() - 1
+        x, y = index % width + dx, index // width + dy
+        if x < 0 or x >= width or y < 0 or y >= height:
+            return None
+        new_position = 1 << (y * width + x)
+        if new_position & (state.wall | state.numbered_mask | state.lava_wall):
+            return None
+        if new_position & state.block:
+            x, y = x + dx, y + dy
+            if x < 0 or x >= width or y < 0 or y >= height:
+                return None
+            block_position = 1 << (y * width + x)
+            if block_position & (state.wall | state.block | state.numbered_mask | state.goal | state.lava_wall):
+                return None
+        return new_position
+
+    def apply_move(self, state, action, new_position):
+        """Build the successor of an already validated move"""
+        board = self.move_player(state, action, new_position)
+        self.step_blocks(board)
+        return board
+
+    def expand(self, state):
+        """
+        Return the (action, new state) pairs of all the valid moves.
+        The numbered, lava and aqua update is computed once for all the moves
+        that don't push a block and don't start or end next to lava or aqua
+        """
+        if not state.player:
+            return []
+        fluid = state.lava | state.aqua
+        near_fluid = fluid | self.neighbours(fluid, state.width, state.height)
+        successors = []
+        shared = None
+        for action in self.directions:
+            new_position = self.target_position(state, action)
+            if new_position is None:
+                continue
+            if (new_position & state.block) or ((state.player | new_position) & near_fluid):
+                successors.append((action, self.apply_move(state, action, new_position)))
+                continue
+            if shared is None:
+                shared = BitboardState(
+                    state.width, state.height,
+                    wall=state.wall, lava=state.lava, aqua=state.aqua, block=state.block,
+                    lava_wall=state.lava_wall, goal_orb=state.goal_orb, goal=state.goal,
+                    player=state.player, numbered=state.numbered
+                )
+                self.step_blocks(shared)
+            successors.append((action, BitboardState(
+                state.width, state.height,
+                wall=shared.wall, lava=shared.lava, aqua=shared.aqua, block=shared.block,
+                lava_wall=shared.lava_wall, goal_orb=shared.goal_orb & ~new_position, goal=shared.goal,
+                player=new_position, numbered=shared.numbered,
+                parent=state, action=action, path_cost=state.path_cost + 1
+            )))
+        return self.prune_dead(state, successors)
+
+    def move_player(self, state, action, new_position):
+        """
+        Return the successor board right after the player moved (and pushed a block),
+        before the numbered blocks, lava and aqua are updated
+        """
+        lava, aqua, block = state.lava, state.aqua, state.block
+        # Move the player and collect the GOAL ORB under it
+        goal_orb = state.goal_orb & ~new_position
+        # Push the block, it replaces lava or aqua but keeps the cell properties
+        if new_position & block:
+            dx, dy = self.directions[action]
+            block_position = 1 << (new_position.bit_length() - 1 + dy * state.width + dx)
+            block = (block & ~new_position) | block_position
+            lava &= ~block_position
+            aqua &= ~block_position
+        board = BitboardState(
+            state.width, state.height,
+            wall=state.wall, lava=lava, aqua=aqua, block=block, lava_wall=state.lava_wall,
+            goal_orb=goal_orb, goal=state.goal, player=new_position, numbered=state.numbered,
+            parent=state, action=action, path_cost=state.path_cost + 1
+        )
+        return board
+
+    def step_blocks(self, board):
+        """Update the numbered blocks, lava and aqua of a board in place"""
+        width, height = board.width, board.height
+        wall, lava, aqua, block = board.wall, board.lava, board.aqua, board.block
+        lava_wall, goal_orb, goal, player = board.lava_wall, board.goal_orb, board.goal, board.player
+        source_aqua = aqua
+        # Decrement the numbered blocks and drop the ones that hit zero
+        numbered = tuple((index, moves - 1) for index, moves in board.numbered if moves > 1)
+        numbered_mask = 0
+        for index, _ in numbered:
+            numbered_mask |= 1 << index
+        # Lava spreads into empty cells, over the player, and under the special properties
+        blocked = wall | block | numbered_mask
+        special = lava_wall | goal_orb | goal
+        reached = self.neighbours(lava, width, height)
+        fresh = reached & ((lava & player) | (~blocked & ~lava & ~special & (~aqua | player)))
+        converted = reached & ~blocked & ~lava & special
+        if fresh or converted:
+            lava |= fresh | converted
+            aqua &= ~(fresh | converted)
+            lava_wall &= ~fresh
+            goal_orb &= ~fresh
+            goal &= ~fresh
+            player &= ~fresh
+        # Aqua spreads into empty cells, under the special properties and the player,
+        # and turns plain lava into walls (steam)
+        reached = self.neighbours(source_aqua, width, height) & ~(blocked | aqua)
+        keep_properties = reached & (lava_wall | goal_orb | goal | player)
+        rest = reached & ~keep_properties
+        steam = rest & lava
+        if reached:
+            aqua |= keep_properties | (rest & ~lava)
+            lava &= ~(keep_properties | steam)
+            wall |= steam
+        board.wall, board.lava, board.aqua = wall, lava, aqua
+        board.lava_wall, board.goal_orb, board.goal, board.player = lava_wall, goal_orb, goal, player
+        board.numbered, board.numbered_mask = numbered, numbered_mask
+
+    def all_valid_moves(self, state):
+        """
+        check all the four moves up, down, left and right
+        which can be valid
+        """
+        if not state.player:
+            return []
+        return [action for action in self.directions if self.target_position(state, action) is not None]
+
+    def is_player_dead(self, state):
+        """Check if player was killed by lava (no player bit left)"""
+        return not state.player
+
+    def goal_test(self, state):
+        """Check if the player reached the goal - returns True if yes"""
+        return state.player == state.goal and not state.goal_orb
+
+    def walls_changed(self, parent, state):
+        return state.wall != parent.wall
+
+    def wall_key(self, state):
+        return (state.width, state.height, state.wall)
+
+    def new_walls(self, parent, state):
+        return set(state.positions(state.wall & ~parent.wall))
+
+    def is_blocked(self, state, position):
+        x, y = position
+        if x < 0 or x >= state.width or y < 0 or y >= state.height:
+            return True
+        return bool((state.wall | state.lava_wall) >> (y * state.width + x) & 1)
+
+    def static_walls(self, state, lava_walls):
+        mask = state.wall | state.lava_wall if lava_walls else state.wall
+        return set(state.positions(mask))
@@ -0,0 +1,46 @@
+import os
+import tempfile
+
+def default_cache_directory():
+    """$LAVA_AQUA_CACHE, or lava_and_aqua in the user cache directory"""
+    directory = os.environ.get("LAVA_AQUA_CACHE")
+    if directory:
+        return directory
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "lava_and_aqua")
+
+def write_atomic(path, data):
+    """
+    Write the bytes to a temporary file next to path and rename it into place,
+    so a reader (another process) never sees half a file
+    """
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, 'wb') as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+    except OSError:
+        try:
+            os.remove(temporary_path)
+        except OSError:
+            pass
+        raise
+
+def evict_least_recent(directory, suffix, max_entries):
+    """Remove the least recently used (oldest modification time) files with the suffix past max_entries"""
+    entries = []
+    for name in os.listdir(directory):
+        if name.endswith(suffix):
+            path = os.path.join(directory, name)
+            try:
+                entries.append((os.path.getmtime(path), path))
+            except OSError:
+                continue
+    entries.sort()
+    for _, path in entries[:max(0, len(entries) - max_entries)]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
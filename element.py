@@ -1,5 +1,9 @@
 from enum import Enum
+from collections.abc import MutableMapping
+import os
 import csv
+import glob
+import level_format
 
 class ElementType(Enum):
     LAVA = 'L'
@@ -10,19 +14,291 @@ class ElementType(Enum):
     GOAL = 'G'
     EMPTY = ' '
 
+# Property bit flags of GameElement.flags
+LAVA_WALL = 1
+GOAL_ORB = 2
+PLAYER = 4
+GOAL = 8
+PROPERTY_FLAGS = {
+    'lava_wall': LAVA_WALL,
+    'goal_orb': GOAL_ORB,
+    'player': PLAYER,
+    'goal': GOAL
+}
+
 class GameElement:
+    """
+    One cell of the level: its type, the property bit flags (LAVA_WALL, GOAL_ORB,
+    PLAYER, GOAL) and the moves left of a numbered block (None for the other cells).
+    properties is a dict-like view of them ({'player': True, 'moves_remaining': 3, ...}).
+
+    The cells with nothing but a type that never changes in place (walls, lava, aqua)
+    are shared flyweights (GameElement.shared), copying the elements of a state keeps them
+    as they are. A shared element is never modified: copy() it first (see writable_element).
+    """
+    __slots__ = ('type', 'position', 'flags', 'moves_remaining', 'is_shared')
+    _shared = {}
+
     def __init__(self, element_type, position, properties = None):
         self.type = element_type
         self.position = position
-        self.properties = properties or {
-            'lava_wall': False,
-            'goal_orb': False,
-            'player': False,
-            'goal': False
-        }
-    
+        self.flags = 0
+        self.moves_remaining = None
+        self.is_shared = False
+        if properties:
+            view = self.properties
+            for name, value in properties.items():
+                view[name] = value
+
+    @classmethod
+    def shared(cls, element_type):
+        """Return the flyweight element of a type (its position is None)"""
+        element = cls._shared.get(element_type)
+        if element is None:
+            element = cls._shared[element_type] = cls(element_type, None)
+            element.is_shared = True
+        return element
+
+    def copy(self, position=None):
+        """Return a modifiable copy of the element (at the position, for the shared ones)"""
+        element = GameElement(self.type, self.position if position is None else position)
+        element.flags = self.flags
+        element.moves_remaining = self.moves_remaining
+        return element
+
+    @property
+    def properties(self):
+        return ElementProperties(self)
+
+class ElementProperties(MutableMapping):
+    """The properties of an element as a dict: the flags as booleans and moves_remaining"""
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    def __getitem__(self, name):
+        if name == 'moves_remaining':
+            if self.element.moves_remaining is None:
+                raise KeyError(name)
+            return self.element.moves_remaining
+        return bool(self.element.flags & PROPERTY_FLAGS[name])
+
+    def __setitem__(self, name, value):
+        element = self.element
+        if element.is_shared:
+            raise ValueError(f"Can't modify a shared {element.type} element, copy it first")
+        if name == 'moves_remaining':
+            element.moves_remaining = value
+        elif value:
+            element.flags |= PROPERTY_FLAGS[name]
+        else:
+            element.flags &= ~PROPERTY_FLAGS[name]
+
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self[name] = None if name == 'moves_remaining' else False
+
+    def __iter__(self):
+        yield from PROPERTY_FLAGS
+        if self.element.moves_remaining is not None:
+            yield 'moves_remaining'
+
+    def __len__(self):
+        return len(PROPERTY_FLAGS) + (self.element.moves_remaining is not None)
+
+class DeltaElements(MutableMapping):
+    """
+    Copy-on-write elements of a successor state: the cells it changed (None marks
+    a removed cell) on top of the elements of its parent, down to a snapshot dict
+    that is never modified. A successor is created without copying anything,
+    a lookup goes down the chain of changes (at most MAX_DEPTH + 1 dict probes
+    before the snapshot). Past MAX_DEPTH, the changes are folded into a new snapshot
+    once per parent and shared by its successors
+    """
+    MAX_DEPTH = 4
+
+    def __init__(self, base, parent=None):
+        self.base = base
+        self.parent = parent
+        self.depth = parent.depth + 1 if parent is not None else 0
+        self.delta = {}
+        self._snapshot = None
+
+    @classmethod
+    def successor(cls, elements):
+        """Create the (still writable) elements of a successor state"""
+        if not isinstance(elements, DeltaElements):
+            return cls(elements)
+        if elements.depth >= cls.MAX_DEPTH:
+            return cls(elements.snapshot())
+        return cls(elements.base, elements)
+
+    def changes(self):
+        """The changes of the whole chain since the snapshot (the latest one of each cell)"""
+        layers = []
+        elements = self
+        while elements is not None:
+            layers.append(elements.delta)
+            elements = elements.parent
+        changes = {}
+        for delta in reversed(layers):
+            changes.update(delta)
+        return changes
+
+    def snapshot(self):
+        """Return a plain dict with the changes applied on the base (built once)"""
+        if self._snapshot is None:
+            elements = self.base.copy()
+            for position, element in self.changes().items():
+                if element is None:
+                    elements.pop(position, None)
+                else:
+                    elements[position] = element
+            self._snapshot = elements
+        return self._snapshot
+
+    def writable(self, position):
+        """Return the element at the position, copied first if it is shared with other states"""
+        element = self.delta.get(position)
+        if element is None or element.is_shared:
+            element = self[position].copy(position)
+            self.delta[position] = element
+        return element
+
+    def get(self, position, default=None):
+        elements = self
+        while elements is not None:
+            element = elements.delta.get(position, elements)
+            if element is not elements:
+                return default if element is None else element
+            elements = elements.parent
+        element = self.base.get(position)
+        return default if element is None else element
+
+    def __getitem__(self, position):
+        element = self.get(position)
+        if element is None:
+            raise KeyError(position)
+        return element
+
+    def __contains__(self, position):
+        return self.get(position) is not None
+
+    def __setitem__(self, position, element):
+        self.delta[position] = element
+
+    def __delitem__(self, position):
+        if position not in self:
+            raise KeyError(position)
+        self.delta[position] = None
+
+    def __iter__(self):
+        for position, _ in self.items():
+            yield position
+
+    def __len__(self):
+        return sum(1 for _ in self.items())
+
+    def items(self):
+        changes = self.changes()
+        for position, element in self.base.items():
+            if position not in changes:
+                yield position, element
+        for position, element in changes.items():
+            if element is not None:
+                yield position, element
+
+class ZobristKeys(dict):
+    """
+    Random 63-bit keys for one feature (player, lava, ...) at each position,
+    derived from the position with splitmix64 so every process gets the same keys
+    """
+    MASK = (1 << 63) - 1
+
+    def __init__(self, layer):
+        super().__init__()
+        self.layer = layer
+
+    def __missing__(self, key):
+        seed = hash((self.layer, key)) & 0xFFFFFFFFFFFFFFFF
+        seed = (seed + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        seed = ((seed ^ (seed >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        seed = ((seed ^ (seed >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        value = (seed ^ (seed >> 31)) & self.MASK
+        self[key] = value
+        return value
+
+ZOBRIST_PLAYER = ZobristKeys(1)
+ZOBRIST_GOAL = ZobristKeys(2)
+ZOBRIST_GOAL_ORB = ZobristKeys(3)
+ZOBRIST_LAVA = ZobristKeys(4)
+ZOBRIST_AQUA = ZobristKeys(5)
+ZOBRIST_MOVABLE_BLOCK = ZobristKeys(6)
+# keyed by (position, moves_remaining)
+ZOBRIST_NUMBERED_BLOCK = ZobristKeys(7)
+
+def positions_near(changed, positions):
+    """Return the positions at or next to (up, down, left, right) any changed position"""
+    near = set()
+    for x, y in changed:
+        for position in ((x, y), (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if position in positions:
+                near.add(position)
+    return near
+
+def pack_layers(width, height, masks, numbered):
+    """
+    Pack bitmask layers over width * height cells and the sorted (index, moves_remaining)
+    pairs of the numbered blocks into bytes, equal states give equal bytes
+    """
+    size = (width * height + 7) // 8
+    parts = [mask.to_bytes(size, 'little') for mask in masks]
+    for index, moves in numbered:
+        parts.append(index.to_bytes(2, 'little') + moves.to_bytes(2, 'little'))
+    return b''.join(parts)
+
+class StaticLayer:
+    """
+    The part of a level that never changes: its size and the walls it starts with,
+    shared by all the states of the level instead of being in their elements.
+    (The goal and the lava walls stay in the elements: lava and aqua can cover them,
+    and the walls made by steam are in the elements of the states they appear in)
+    """
+    __slots__ = ('width', 'height', 'walls')
+
+    def __init__(self, width, height, walls=frozenset()):
+        self.width = width
+        self.height = height
+        self.walls = frozenset(walls)
+
+    def blocks(self, position):
+        """Check if nothing can ever be at the position (outside the level or a wall)"""
+        x, y = position
+        return x < 0 or x >= self.width or y < 0 or y >= self.height or position in self.walls
+
 class GameState:
-    def __init__(self, elements, width: int, height: int,  parent=None, action=None, path_cost=0):
+    def __init__(self, elements, width: int, height: int,  parent=None, action=None, path_cost=0, changed=None,
+                 static=None):
+        """
+        static: the StaticLayer of the level (the parent's one by default), the elements
+        only hold the cells that can change plus the walls made by steam
+
+        changed: the positions whose elements differ from the parent state,
+        when given the position sets and the hash are derived from the parent
+        instead of rescanning every element
+
+        lava_front / aqua_front: the lava and aqua cells that may still spread,
+        a fluid cell that none of its neighbours changed already spread
+        everywhere it could in the previous move
+
+        wall_positions: the static walls and the steam walls, frozenset shared
+        with the parent until steam adds a wall
+        """
+        if static is None:
+            static = parent.static if parent is not None else StaticLayer(width, height)
+        self.static = static
         self.elements = elements
         self.width = width
         self.height = height
@@ -30,6 +306,9 @@ class GameState:
         self.action = action
         self.path_cost = path_cost
         self._hash = None
+        if parent is not None and changed is not None:
+            self.update_from_parent(parent, changed)
+            return
         self.player_position = None
         self.goal_position = None
         self.lava_positions = set()
@@ -37,14 +316,15 @@ class GameState:
         self.goal_orb_position = set()
         self.movable_blocks = set()
         self.numbered_blocks = {}
+        steam_walls = []
 
         for position, element in self.elements.items():
-            props = element.properties
-            if props.get("player", False):
+            flags = element.flags
+            if flags & PLAYER:
                 self.player_position = position
-            if props.get("goal_orb", False):
+            if flags & GOAL_ORB:
                 self.goal_orb_position.add(position)
-            if props.get("goal", False):
+            if flags & GOAL:
                 self.goal_position = position
             if element.type == ElementType.LAVA:
                 self.lava_positions.add(position)
@@ -53,30 +333,139 @@ class GameState:
             elif element.type == ElementType.MOVABLE_BLOCK:
                 self.movable_blocks.add(position)
             elif element.type == ElementType.NUMBERED_BLOCK:
-                self.numbered_blocks[position] = element.properties.get("moves_remaining", 0)
-            
+                self.numbered_blocks[position] = element.moves_remaining or 0
+            elif element.type == ElementType.WALL:
+                steam_walls.append(position)
+        self.wall_positions = static.walls.union(steam_walls) if steam_walls else static.walls
+        self.lava_front = set(self.lava_positions)
+        self.aqua_front = set(self.aqua_positions)
+
+    def update_from_parent(self, parent, changed):
+        """
+        Copy the parent position sets and only re-read the changed positions,
+        the hash is the parent hash with the old and new keys of those positions XORed in
+        """
+        self.player_position = parent.player_position
+        self.goal_position = parent.goal_position
+        self.lava_positions = parent.lava_positions.copy()
+        self.aqua_positions = parent.aqua_positions.copy()
+        self.goal_orb_position = parent.goal_orb_position.copy()
+        self.movable_blocks = parent.movable_blocks.copy()
+        self.numbered_blocks = parent.numbered_blocks.copy()
+        self.wall_positions = parent.wall_positions
+        steam_walls = []
+        for position in changed:
+            element = self.elements.get(position)
+            if element is None:
+                flags = 0
+                element_type = ElementType.EMPTY
+            else:
+                flags = element.flags
+                element_type = element.type
+            if flags & PLAYER:
+                self.player_position = position
+            elif self.player_position == position:
+                self.player_position = None
+            if flags & GOAL:
+                self.goal_position = position
+            elif self.goal_position == position:
+                self.goal_position = None
+            self.update_position_set(self.goal_orb_position, position, bool(flags & GOAL_ORB))
+            self.update_position_set(self.lava_positions, position, element_type == ElementType.LAVA)
+            self.update_position_set(self.aqua_positions, position, element_type == ElementType.AQUA)
+            self.update_position_set(self.movable_blocks, position, element_type == ElementType.MOVABLE_BLOCK)
+            if element_type == ElementType.NUMBERED_BLOCK:
+                self.numbered_blocks[position] = element.moves_remaining or 0
+            else:
+                self.numbered_blocks.pop(position, None)
+            if element_type == ElementType.WALL and position not in self.wall_positions:
+                steam_walls.append(position)
+        if steam_walls:
+            self.wall_positions = self.wall_positions.union(steam_walls)
+        self.lava_front = positions_near(changed, self.lava_positions)
+        self.aqua_front = positions_near(changed, self.aqua_positions)
+        zobrist = hash(parent)
+        for position in changed:
+            zobrist ^= parent.position_key(position) ^ self.position_key(position)
+        self._hash = zobrist
+
+    def update_position_set(self, positions, position, present):
+        if present:
+            positions.add(position)
+        else:
+            positions.discard(position)
+
+    def position_key(self, position):
+        """XOR of the zobrist keys of every feature this state has at the position"""
+        key = 0
+        if position == self.player_position:
+            key ^= ZOBRIST_PLAYER[position]
+        if position == self.goal_position:
+            key ^= ZOBRIST_GOAL[position]
+        if position in self.goal_orb_position:
+            key ^= ZOBRIST_GOAL_ORB[position]
+        if position in self.lava_positions:
+            key ^= ZOBRIST_LAVA[position]
+        elif position in self.aqua_positions:
+            key ^= ZOBRIST_AQUA[position]
+        elif position in self.movable_blocks:
+            key ^= ZOBRIST_MOVABLE_BLOCK[position]
+        elif position in self.numbered_blocks:
+            key ^= ZOBRIST_NUMBERED_BLOCK[(position, self.numbered_blocks[position])]
+        return key
+
+    @property
+    def lava_count(self):
+        return len(self.lava_positions)
+
+    def packed(self):
+        """The features compared by __eq__ as bytes (see pack_layers)"""
+        width = self.width
+        masks = []
+        for positions in (
+            (self.player_position,) if self.player_position is not None else (),
+            (self.goal_position,) if self.goal_position is not None else (),
+            self.goal_orb_position, self.lava_positions, self.aqua_positions, self.movable_blocks
+        ):
+            mask = 0
+            for x, y in positions:
+                mask |= 1 << (y * width + x)
+            masks.append(mask)
+        numbered = sorted((y * width + x, moves) for (x, y), moves in self.numbered_blocks.items())
+        return pack_layers(width, self.height, masks, numbered)
     
     def __hash__(self):
         if self._hash is not None:
             return self._hash
 
-        # Create a canonical, immutable representation
-        data = (
-            self.player_position,
-            tuple(sorted(self.goal_position)) if self.goal_position else tuple(),
-            tuple(sorted(self.goal_orb_position)) if self.goal_orb_position else tuple(),
-            tuple(sorted(self.lava_positions)) if self.lava_positions else tuple(),
-            tuple(sorted(self.aqua_positions)) if self.aqua_positions else tuple(),
-            tuple(sorted(self.movable_blocks)) if self.movable_blocks else tuple(),
-            tuple(sorted((pos, moves) for pos, moves in self.numbered_blocks.items())) if self.numbered_blocks else tuple()
-        )
+        # Zobrist hash: XOR of one random key per (feature, position)
+        zobrist = 0
+        if self.player_position is not None:
+            zobrist ^= ZOBRIST_PLAYER[self.player_position]
+        if self.goal_position is not None:
+            zobrist ^= ZOBRIST_GOAL[self.goal_position]
+        for position in self.goal_orb_position:
+            zobrist ^= ZOBRIST_GOAL_ORB[position]
+        for position in self.lava_positions:
+            zobrist ^= ZOBRIST_LAVA[position]
+        for position in self.aqua_positions:
+            zobrist ^= ZOBRIST_AQUA[position]
+        for position in self.movable_blocks:
+            zobrist ^= ZOBRIST_MOVABLE_BLOCK[position]
+        for position, moves in self.numbered_blocks.items():
+            zobrist ^= ZOBRIST_NUMBERED_BLOCK[(position, moves)]
 
-        self._hash = hash(data)
+        self._hash = zobrist
         return self._hash
 
     def __eq__(self, other):
+        if self is other:
+            return True
         if not isinstance(other, GameState):
             return False
+        # Only compare the positions when the hashes collide
+        if hash(self) != hash(other):
+            return False
 
         return (
             self.player_position == other.player_position and
@@ -88,77 +477,139 @@ class GameState:
             self.numbered_blocks == other.numbered_blocks
         )
 
+class LevelLoadError(ValueError):
+    """A level file that can't be loaded (the message says which file and why)"""
+
+# The layer (see level_format.LAYERS) of each CSV cell, the numbers are numbered blocks
+CSV_CELLS = {
+    '#': 'wall',
+    'P': 'player',
+    'G': 'goal',
+    'O': 'goal_orb',
+    'W': 'lava_wall',
+    'L': 'lava',
+    'A': 'aqua',
+    'B': 'block'
+}
+
+# The element of each layer: (type, property flags), the walls are in the static layer
+LAYER_ELEMENTS = {
+    'player': (ElementType.EMPTY, PLAYER),
+    'goal': (ElementType.EMPTY, GOAL),
+    'goal_orb': (ElementType.EMPTY, GOAL_ORB),
+    'lava_wall': (ElementType.EMPTY, LAVA_WALL),
+    'lava': (ElementType.LAVA, 0),
+    'aqua': (ElementType.AQUA, 0),
+    'block': (ElementType.MOVABLE_BLOCK, 0)
+}
+
 class LevelLoader:
-    def load_level(filename: str) -> GameState:
+    # The compiled level cache of load_level (see level_format.LevelCache), off by default:
+    # parsing a CSV level costs little next to building its state (main.py --level-cache sets one)
+    cache = None
+
+    def load_level(filename: str, cache=True) -> GameState:
         """
-        take the level as a csv file and return a Game State
+        take the level as a csv file (or a binary level, see level_format) and return a Game State
+
+        cache: use the compiled level cache (LevelLoader.cache) when one is set, a CSV level
+        is parsed once and then memory mapped from its binary form (keyed by the CSV contents)
         """
         try:
-            # Load level from csv file
-            with open(filename, 'r') as file:
-                reader = csv.reader(file)
-                lines = [row for row in reader]
-            if not lines:
-                raise ValueError(f"Empty level file: {filename}")
-            height = len(lines)
-            width = len(lines[0]) if height > 0 else 0
-            # Create a hash table (dictionary) for elements
-            elements = {}
-            for y, row in enumerate(lines):
-                # give an error if any row didn't equal the width 
-                if len(row) != width:
-                    raise ValueError(f"Inconsistent row length in {filename} at row {y+1}")
-                for x, cell in enumerate(row):
-                    position = (x, y)
-                    cell = cell.strip()
-                    if not cell or cell == ' ':
-                        continue
-                    if cell == 'P':
-                        elements[position] = GameElement(
-                            ElementType.EMPTY,
-                            position,
-                            {'player': True}
-                        )
-                    elif cell == 'L':
-                        elements[position] = GameElement(ElementType.LAVA, position)
-                    elif cell == 'A':
-                        elements[position] = GameElement(ElementType.AQUA, position)
-                    elif cell == '#':
-                        elements[position] = GameElement(ElementType.WALL, position)
-                    elif cell == 'B':
-                        elements[position] = GameElement(ElementType.MOVABLE_BLOCK, position)
-                    elif cell == 'G':
-                        elements[position] = GameElement(
-                            ElementType.EMPTY,
-                            position,
-                            {'goal': True}
-                        )
-                    elif cell == 'O':
-                        elements[position] = GameElement(
-                            ElementType.EMPTY,
-                            position,
-                            {'goal_orb': True}
-                        )
-                    elif cell == 'W':
-                        elements[position] = GameElement(
-                            ElementType.EMPTY, 
-                            position, 
-                            {'lava_wall': True}
-                        )
-                    else:
-                        # Check if it's a numbered block (numeric value)
-                        try:
-                            moves = int(cell)
-                            elements[position] = GameElement(
-                                ElementType.NUMBERED_BLOCK, 
-                                position, 
-                                {'moves_remaining': moves}
-                            )
-                        except ValueError:
-                            # If not a number, treat as empty
-                            continue
-            return GameState(elements, width, height)
+            with open(filename, 'rb') as file:
+                source = file.read(len(level_format.MAGIC))
+                if source != level_format.MAGIC:
+                    source += file.read()
         except FileNotFoundError:
             raise FileNotFoundError(f"Level file not found: {filename}")
-        except Exception as e:
-            raise Exception(f"Error loading level {filename}: {str(e)}")
+        except OSError as e:
+            raise LevelLoadError(f"Error loading level {filename}: {e}")
+        level_cache = LevelLoader.cache if cache else None
+        try:
+            if source == level_format.MAGIC:
+                # A binary level is memory mapped instead of read whole
+                return LevelLoader.build_state(*level_format.read_level_file(filename))
+            level = level_cache.get(source) if level_cache is not None else None
+            if level is None:
+                level = LevelLoader.parse_csv(source)
+                if level_cache is not None:
+                    level_cache.put(source, level)
+            return LevelLoader.build_state(*level)
+        except (ValueError, OSError) as e:
+            raise LevelLoadError(f"Error loading level {filename}: {e}") from e
+
+    def level_files(patterns, directory=""):
+        """The level files of the names or glob patterns (relative to the directory), a pattern matching nothing is kept as is"""
+        files = []
+        for pattern in patterns:
+            pattern = os.path.join(directory, pattern)
+            files.extend(sorted(glob.glob(pattern)) or [pattern])
+        # Natural order: level2 before level10, without duplicates
+        return sorted(set(files), key=lambda name: (len(name), name))
+
+    def compile_level(filename: str, output_file: str):
+        """Write the binary form of a CSV level"""
+        try:
+            with open(filename, 'rb') as file:
+                level = LevelLoader.parse_csv(file.read())
+            level_format.write_level_file(output_file, level_format.pack_level(*level))
+        except ValueError as e:
+            raise LevelLoadError(f"Error compiling level {filename}: {e}") from e
+
+    def parse_csv(source: bytes):
+        """
+        Parse the CSV level, return (width, height, layer name -> cell indices,
+        cell index -> moves of the numbered blocks) with the cell index y * width + x
+        """
+        lines = list(csv.reader(source.decode('utf-8').splitlines()))
+        if not lines:
+            raise ValueError("Empty level file")
+        height = len(lines)
+        width = len(lines[0])
+        layers = {}
+        numbered = {}
+        for y, row in enumerate(lines):
+            # give an error if any row didn't equal the width
+            if len(row) != width:
+                raise ValueError(f"Inconsistent row length at row {y+1}")
+            for x, cell in enumerate(row):
+                cell = cell.strip()
+                if not cell:
+                    continue
+                index = y * width + x
+                layer = CSV_CELLS.get(cell)
+                if layer is not None:
+                    layers.setdefault(layer, []).append(index)
+                    continue
+                # Check if it's a numbered block (numeric value)
+                try:
+                    numbered[index] = int(cell)
+                except ValueError:
+                    # If not a number, treat as empty
+                    continue
+        return width, height, layers, numbered
+
+    def build_state(width, height, layers, numbered) -> GameState:
+        """Create the initial Game State of a parsed (or unpacked) level"""
+        elements = {}
+        for name, indices in layers.items():
+            if name == 'wall':
+                continue
+            element_type, flags = LAYER_ELEMENTS[name]
+            if element_type in (ElementType.LAVA, ElementType.AQUA):
+                shared = GameElement.shared(element_type)
+                for index in indices:
+                    elements[(index % width, index // width)] = shared
+                continue
+            for index in indices:
+                position = (index % width, index // width)
+                element = GameElement(element_type, position)
+                element.flags = flags
+                elements[position] = element
+        for index, moves in numbered.items():
+            position = (index % width, index // width)
+            element = GameElement(ElementType.NUMBERED_BLOCK, position)
+            element.moves_remaining = moves
+            elements[position] = element
+        walls = [(index % width, index // width) for index in layers.get('wall', ())]
+        return GameState(elements, width, height, static=StaticLayer(width, height, walls))
@@ -1,4 +1,12 @@
-from element import GameElement, ElementType, GameState
+import heapq
+import math
+from collections import deque
+from element import (GameElement, ElementType, GameState, LevelLoader, DeltaElements, positions_near,
+                     LAVA_WALL, GOAL_ORB, PLAYER, GOAL)
+
+# Version of the game rules the engines implement, bump it when a rule changes
+# so that the solutions cached with the old rules are not used anymore (see solution_cache.py)
+ENGINE_RULES_VERSION = 1
 
 class Direction:
     UP = 'UP'
@@ -7,13 +15,35 @@ class Direction:
     RIGHT = 'RIGHT'
 
 class GameEngine:
-    def __init__(self):
+    # Cached component maps / player distance maps before the caches are cleared
+    CACHE_SIZE = 256
+
+    def __init__(self, delta_successors=False, fluid_pruning=False):
+        """
+        delta_successors: build successor elements as DeltaElements on top of
+        the parent elements instead of copying every element
+        fluid_pruning: also prune the states where lava reaches a goal orb
+        before the player can (see lava_wins_race)
+        """
+        self.delta_successors = delta_successors
+        self.fluid_pruning = fluid_pruning
+        self.pruned_states = 0
+        self._components = {}
+        self._player_distances = {}
         self.directions = {
             Direction.UP: (0, -1),
             Direction.DOWN: (0, 1),
             Direction.LEFT: (-1, 0),
             Direction.RIGHT: (1, 0)
         }
+
+    def settings(self):
+        """The options this engine was created with (to create the same engine in another process)"""
+        return {'delta_successors': self.delta_successors, 'fluid_pruning': self.fluid_pruning}
+
+    def load_level(self, level_file):
+        """Load the level file as the initial state this engine works on"""
+        return LevelLoader.load_level(level_file)
     
     def transition_model(self, state, action):
         """
@@ -34,23 +64,22 @@ class GameEngine:
         # Check if the move is valid (return None if not)
         if not self.is_valid_move(state, new_position, (dx, dy)):
             return None
+        return self.apply_move(state, action, new_position)
+
+    def apply_move(self, state, action, new_position):
+        """Build the new state of an already validated move"""
+        dx, dy = self.directions[action]
         # Copy the element (new_elements)
-        new_elements = self.fast_copy_elements(state.elements)
-        # Move the player to the new position
-        new_elements[player_position].properties['player'] = False
-        if new_position in new_elements:
-            new_elements[new_position].properties['player'] = True
-        else:
-            new_elements[new_position] = GameElement(ElementType.EMPTY, new_position, {'player': True})
-        # Remove the GOAL ORB if the player on it
-        if new_elements[new_position].properties.get('goal_orb', False):
-            new_elements[new_position].properties['goal_orb'] = False
+        new_elements = self.copy_elements(state.elements)
+        # Move the player to the new position and keep track of the changed positions
+        # so the new state is derived from its parent
+        changed = self.move_player(new_elements, state.player_position, new_position)
         # Handle block pushing if necessary
-        self.push_block(new_elements, new_position, (dx, dy))        
+        block_new_position = self.push_block(new_elements, new_position, (dx, dy))
+        if block_new_position is not None:
+            changed.add(block_new_position)
         # Update blocks (numbered - lava - aqua)
-        self.update_numbered_blocks(new_elements, state.numbered_blocks)
-        self.update_lava_blocks(new_elements, state.lava_positions)
-        self.update_aqua_blocks(new_elements, state.aqua_positions)
+        changed = self.update_blocks(state, new_elements, changed)
         # Return new state
         return GameState(
             elements=new_elements,
@@ -58,8 +87,84 @@ class GameEngine:
             height=state.height,
             parent=state,
             action=action,
-            path_cost=state.path_cost + 1
+            path_cost=state.path_cost + 1,
+            changed=changed
         )
+
+    def expand(self, state):
+        """
+        Return the (action, new state) pairs of all the valid moves.
+        Each direction is validated once, and the numbered, lava and aqua update
+        is computed once for all the moves that don't push a block and don't
+        start or end next to lava or aqua (they can't change how the fluid spreads)
+        """
+        player_position = state.player_position
+        if player_position is None:
+            return []
+        successors = []
+        shared_elements = None
+        for action, (dx, dy) in self.directions.items():
+            new_position = (player_position[0] + dx, player_position[1] + dy)
+            if not self.is_valid_move(state, new_position, (dx, dy)):
+                continue
+            target_element = state.elements.get(new_position)
+            if ((target_element is not None and target_element.type == ElementType.MOVABLE_BLOCK)
+                or self.is_near_fluid(state, player_position)
+                or self.is_near_fluid(state, new_position)
+                ):
+                successors.append((action, self.apply_move(state, action, new_position)))
+                continue
+            if shared_elements is None:
+                shared_elements = self.copy_elements(state.elements)
+                shared_changed = self.update_blocks(state, shared_elements, set())
+            new_elements = self.copy_shared_elements(shared_elements, (player_position, new_position))
+            changed = shared_changed | self.move_player(new_elements, player_position, new_position)
+            successors.append((action, GameState(
+                elements=new_elements,
+                width=state.width,
+                height=state.height,
+                parent=state,
+                action=action,
+                path_cost=state.path_cost + 1,
+                changed=changed
+            )))
+        return self.prune_dead(state, successors)
+
+    def is_near_fluid(self, state, position):
+        """Check if there is lava or aqua at or next to the position"""
+        x, y = position
+        for near in ((x, y), (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            if near in state.lava_positions or near in state.aqua_positions:
+                return True
+        return False
+
+    def move_player(self, elements, player_position, new_position):
+        """Move the player and collect the GOAL ORB under it, return the changed positions"""
+        self.writable_element(elements, player_position).flags &= ~PLAYER
+        if new_position in elements:
+            self.writable_element(elements, new_position).flags |= PLAYER
+        else:
+            elements[new_position] = GameElement(ElementType.EMPTY, new_position, {'player': True})
+        # Remove the GOAL ORB if the player on it
+        if elements[new_position].flags & GOAL_ORB:
+            self.writable_element(elements, new_position).flags &= ~GOAL_ORB
+        return {player_position, new_position}
+
+    def update_blocks(self, state, elements, changed):
+        """
+        Update the numbered, lava and aqua blocks after the player moved
+        changed: the positions the move already changed
+        return all the changed positions
+        """
+        numbered_changed = self.update_numbered_blocks(elements, state.numbered_blocks)
+        changed.update(position for position in numbered_changed if position not in elements)
+        # Only the fluid front and the fluid next to this move's changes can spread
+        lava_sources = state.lava_front | positions_near(changed, state.lava_positions)
+        changed.update(self.update_lava_blocks(elements, lava_sources, state.static))
+        aqua_sources = state.aqua_front | positions_near(changed, state.aqua_positions)
+        changed.update(self.update_aqua_blocks(elements, aqua_sources, state.static))
+        changed.update(numbered_changed)
+        return changed
     
     def all_valid_moves(self, state):
         """
@@ -84,16 +189,15 @@ class GameEngine:
         Check if moving to new position is valid
         return True if the new position is valid and false if it doesn't
         """
-        x, y = new_position
-        # Check if the new player position is outside the map 
-        if x < 0 or x >= state.width or y < 0 or y >= state.height:
+        # Check if the new player position is outside the map or a wall of the level
+        if state.static.blocks(new_position):
             return False
         # Check if the player can move to the target block
         target_element = state.elements.get(new_position)
         if target_element is None:
             return True
         if (target_element.type in [ElementType.WALL, ElementType.NUMBERED_BLOCK]
-              or target_element.properties.get('lava_wall', False)
+              or target_element.flags & LAVA_WALL
               ):
             return False
         elif target_element.type == ElementType.MOVABLE_BLOCK:
@@ -107,9 +211,8 @@ class GameEngine:
         """
         dx, dy = direction
         new_block_position = (block_position[0] + dx, block_position[1] + dy)
-        x, y = new_block_position
-        # Check if the new block position outside the map 
-        if x < 0 or x >= state.width or y < 0 or y >= state.height:
+        # Check if the new block position outside the map or a wall of the level
+        if state.static.blocks(new_block_position):
             return False
         # Check if the space beyond the block is free
         target_element = state.elements.get(new_block_position)
@@ -119,8 +222,7 @@ class GameEngine:
             ElementType.WALL,
             ElementType.MOVABLE_BLOCK,
             ElementType.NUMBERED_BLOCK] 
-            or target_element.properties.get('goal', False)
-            or target_element.properties.get('lava_wall', False)
+            or target_element.flags & (GOAL | LAVA_WALL)
             ):
             return False
         return True
@@ -130,6 +232,7 @@ class GameEngine:
         Push the block to the new position 
         and leave the GOAL ORB behind if it is on the old block position
         and don't remove it if it is on the new block position
+        return the block new position or None if there is no block to push
         """
         dx, dy = direction
         target_element = elements.get(new_position)
@@ -137,33 +240,40 @@ class GameEngine:
             # Calculate the block new position
             block_new_position = (new_position[0] + dx, new_position[1] + dy)
             # Empty the old block position
-            elements[new_position].type = ElementType.EMPTY
+            old_block = self.writable_element(elements, new_position)
+            old_block.type = ElementType.EMPTY
             # Check if there is a GOAL ORB at the old block position
             # if the old block position has GOAL ORB (leave the GOAL ORB behind)
-            if elements[new_position].properties.get('goal_orb', False):
-                elements[new_position].properties['goal_orb'] = True
+            if old_block.flags & GOAL_ORB:
+                old_block.flags |= GOAL_ORB
             # Move the block and don't remove GOAL_ORB from new block position
             new_block = GameElement(ElementType.MOVABLE_BLOCK, block_new_position)
             if block_new_position not in elements:
                 elements[block_new_position] = new_block
             else:
-                elements[block_new_position].type = ElementType.MOVABLE_BLOCK
+                self.writable_element(elements, block_new_position).type = ElementType.MOVABLE_BLOCK
+            return block_new_position
+        return None
     
     def update_numbered_blocks(self, elements, numbered_position):
-        """Decrement moves on numbered blocks and remove if zero"""
+        """Decrement moves on numbered blocks and remove if zero, return the changed positions"""
         blocks_to_remove = []
         for position in numbered_position:
-            block = elements.get(position)
-            if block:
-                block.properties['moves_remaining'] -= 1
-                if block.properties['moves_remaining'] <= 0:
+            if position in elements:
+                block = self.writable_element(elements, position)
+                block.moves_remaining -= 1
+                if block.moves_remaining <= 0:
                     blocks_to_remove.append(position)
         # Remove the blocks when the numbered block hits zero
         for position in blocks_to_remove:
             del elements[position]
+        return numbered_position
 
-    def update_lava_blocks(self, elements, lava_positions):
-        """Make the lave blocks spread up, down, left and right"""
+    def update_lava_blocks(self, elements, lava_positions, static):
+        """
+        Make the lave blocks spread up, down, left and right, return the changed positions
+        static: the StaticLayer of the level (checked first)
+        """
         # Find the new lava blocks 
         new_lava_to_add = set()
         positions_to_remove = set()
@@ -173,11 +283,13 @@ class GameEngine:
             # Check for each direction to the LAVA block if it can spread
             for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
                 new_position = (lava_position[0] + dx, lava_position[1] + dy)
+                if static.blocks(new_position):
+                    continue
                 target_element = elements.get(new_position)
                 if target_element is None:
                     new_lava_to_add.add(new_position)
                 elif (target_element.type == ElementType.LAVA 
-                    and target_element.properties.get('player', False)):
+                    and target_element.flags & PLAYER):
                     new_lava_to_add.add(new_position)
                 elif target_element.type in [
                     ElementType.WALL,
@@ -186,23 +298,24 @@ class GameEngine:
                     ElementType.LAVA
                 ]:
                     continue
-                elif (target_element.properties.get('lava_wall', False)
-                     or target_element.properties.get('goal_orb', False)
-                     or target_element.properties.get('goal', False)
-                     ):
+                elif target_element.flags & (LAVA_WALL | GOAL_ORB | GOAL):
                     positions_to_remove.add(new_position)
-                elif (target_element.properties.get('player', False)
+                elif (target_element.flags & PLAYER
                       or target_element.type == ElementType.EMPTY
                       ):
                     new_lava_to_add.add(new_position)
         for position in positions_to_remove:
             if position in elements:
-                elements[position].type = ElementType.LAVA
+                self.writable_element(elements, position).type = ElementType.LAVA
         for position in new_lava_to_add:
-            elements[position] = GameElement(ElementType.LAVA, position)
+            elements[position] = GameElement.shared(ElementType.LAVA)
+        return positions_to_remove | new_lava_to_add
     
-    def update_aqua_blocks(self, elements, aqua_positions):
-        """Make the aqua blocks spread up, down, left and right"""
+    def update_aqua_blocks(self, elements, aqua_positions, static):
+        """
+        Make the aqua blocks spread up, down, left and right, return the changed positions
+        static: the StaticLayer of the level (checked first)
+        """
         # Find the new aqua blocks
         new_aqua_to_add = set()
         positions_to_steam = set()
@@ -213,6 +326,8 @@ class GameEngine:
             # Check for each direction to the AQUA block if it can spread
             for dx, dy in [(1, 0), (-1, 0), (0, 1), (0, -1)]:
                 new_position = (aqua_position[0] + dx, aqua_position[1] + dy)
+                if static.blocks(new_position):
+                    continue
                 target_element = elements.get(new_position)
                 if target_element is None:
                     new_aqua_to_add.add(new_position)
@@ -223,11 +338,7 @@ class GameEngine:
                     ElementType.AQUA
                 ]:
                     continue
-                elif (target_element.properties.get('lava_wall', False)
-                      or target_element.properties.get('goal_orb', False)
-                      or target_element.properties.get('player', False) 
-                      or target_element.properties.get('goal', False)
-                      ):
+                elif target_element.flags & (LAVA_WALL | GOAL_ORB | PLAYER | GOAL):
                     positions_to_remove.add(new_position)
                 elif target_element.type == ElementType.EMPTY:
                     new_aqua_to_add.add(new_position)
@@ -235,11 +346,12 @@ class GameEngine:
                     positions_to_steam.add(new_position)
         for position in positions_to_remove:
             if position in elements:
-                elements[position].type = ElementType.AQUA
+                self.writable_element(elements, position).type = ElementType.AQUA
         for position in positions_to_steam:
-            elements[position] = GameElement(ElementType.WALL, position)
+            elements[position] = GameElement.shared(ElementType.WALL)
         for position in new_aqua_to_add:
-            elements[position] = GameElement(ElementType.AQUA, position)
+            elements[position] = GameElement.shared(ElementType.AQUA)
+        return positions_to_remove | positions_to_steam | new_aqua_to_add
     
     def is_player_dead(self, state):
         """Check if player was killed by lava (no player found in elements)"""
@@ -250,10 +362,243 @@ class GameEngine:
     def goal_test(self, state):
         """Check if the player reached the goal - returns True if yes"""
         return state.player_position == state.goal_position and len(state.goal_orb_position) == 0
+
+    def prune_dead(self, state, successors):
+        """Drop the (action, new state) pairs whose new state can't be won anymore"""
+        alive = []
+        for action, new_state in successors:
+            if self.is_dead_state(state, new_state):
+                self.pruned_states += 1
+            else:
+                alive.append((action, new_state))
+        return alive
+
+    def is_dead_state(self, parent, state):
+        """
+        Check if a new state can't be won anymore:
+        - the player died (unless that is a win: lava that takes the player
+          on the goal takes the goal too, see goal_test)
+        - new steam walls cut the player off from an orb or the goal
+          (walls and lava walls never go away, and without new walls the
+          player stays in the same part of the level as in the parent)
+        - with fluid_pruning, lava gets to an orb before the player can
+        """
+        if self.is_player_dead(state):
+            return not self.goal_test(state)
+        if (self.walls_changed(parent, state) and self.walls_may_disconnect(parent, state)
+                and not self.goals_reachable(state)):
+            return True
+        return self.fluid_pruning and self.lava_wins_race(state)
+
+    def walls_changed(self, parent, state):
+        # The wall set is shared with the parent until steam adds a wall
+        return state.wall_positions is not parent.wall_positions
+
+    def wall_key(self, state):
+        return (state.width, state.height, state.wall_positions)
+
+    def new_walls(self, parent, state):
+        return state.wall_positions - parent.wall_positions
+
+    def is_blocked(self, state, position):
+        """Check if the player can never walk on the position (wall, lava wall or outside)"""
+        x, y = position
+        if x < 0 or x >= state.width or y < 0 or y >= state.height:
+            return True
+        if position in state.wall_positions:
+            return True
+        element = state.elements.get(position)
+        return element is not None and bool(element.flags & LAVA_WALL)
+
+    def walls_may_disconnect(self, parent, state):
+        """
+        Check if the new steam walls may have cut a part of the level off,
+        new walls that don't touch each other can't when the open cells
+        around each of them are still connected around it
+        """
+        new_walls = self.new_walls(parent, state)
+        for x, y in new_walls:
+            if (x + 1, y) in new_walls or (x, y + 1) in new_walls:
+                return True
+        return not all(self.connected_around(state, position) for position in new_walls)
+
+    def connected_around(self, state, position):
+        """Check if the open cells next to the position are connected through its 8 surrounding cells"""
+        x, y = position
+        # Clockwise from the top: consecutive open cells of the ring are next to each other
+        ring = ((x, y - 1), (x + 1, y - 1), (x + 1, y), (x + 1, y + 1),
+                (x, y + 1), (x - 1, y + 1), (x - 1, y), (x - 1, y - 1))
+        open_cells = [not self.is_blocked(state, cell) for cell in ring]
+        if all(open_cells):
+            return True
+        start = open_cells.index(False)
+        runs = 0
+        in_run = touches_position = False
+        for step in range(1, 9):
+            index = (start + step) % 8
+            if open_cells[index]:
+                if not in_run:
+                    in_run, touches_position = True, False
+                # The even ring cells are the up, right, down and left neighbours
+                touches_position = touches_position or index % 2 == 0
+            else:
+                if in_run and touches_position:
+                    runs += 1
+                in_run = False
+        return runs <= 1
+
+    def static_walls(self, state, lava_walls):
+        """The walls of the state, and its lava walls when lava_walls is True"""
+        walls = set(state.wall_positions)
+        if lava_walls:
+            walls.update(position for position, element in state.elements.items()
+                         if element.flags & LAVA_WALL)
+        return walls
+
+    def components(self, state, lava_walls):
+        """
+        Return {position: component} of the cells that aren't walls (nor lava walls when
+        lava_walls is True), cells with the same component are connected
+        """
+        key = (self.wall_key(state), lava_walls)
+        components = self._components.get(key)
+        if components is not None:
+            return components
+        walls = self.static_walls(state, lava_walls)
+        components = {}
+        for start in ((x, y) for y in range(state.height) for x in range(state.width)):
+            if start in walls or start in components:
+                continue
+            component = len(components)
+            components[start] = component
+            frontier = [start]
+            while frontier:
+                x, y = frontier.pop()
+                for near in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                    if (near not in components and near not in walls
+                            and 0 <= near[0] < state.width and 0 <= near[1] < state.height):
+                        components[near] = component
+                        frontier.append(near)
+        if len(self._components) >= self.CACHE_SIZE:
+            self._components.clear()
+        self._components[key] = components
+        return components
+
+    def goals_reachable(self, state):
+        """Check if the player can still walk to every goal orb left and to the goal"""
+        components = self.components(state, lava_walls=True)
+        player_component = components.get(state.player_position)
+        targets = list(state.goal_orb_position)
+        if state.goal_position is not None:
+            targets.append(state.goal_position)
+        return all(components.get(target) == player_component for target in targets)
+
+    def player_distances(self, state):
+        """BFS moves from the player to every cell, through everything but walls and lava walls"""
+        key = (self.wall_key(state), state.player_position)
+        distances = self._player_distances.get(key)
+        if distances is not None:
+            return distances
+        components = self.components(state, lava_walls=True)
+        distances = {state.player_position: 0}
+        frontier = deque([state.player_position])
+        while frontier:
+            x, y = position = frontier.popleft()
+            for near in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                if near not in distances and near in components:
+                    distances[near] = distances[position] + 1
+                    frontier.append(near)
+        if len(self._player_distances) >= self.CACHE_SIZE:
+            self._player_distances.clear()
+        self._player_distances[key] = distances
+        return distances
+
+    def lava_wins_race(self, state):
+        """
+        Check if lava takes a goal orb before the player can get to it.
+        Only decided where that lava can never go away again:
+        no movable block is left (a pushed block clears lava) and no aqua
+        can ever get to the orb (aqua turns lava under an orb back to aqua)
+        """
+        if state.movable_blocks:
+            return False
+        # Aqua only spreads inside the part of the level (walls excluded) it is in
+        components = self.components(state, lava_walls=False)
+        aqua_components = {components.get(position) for position in state.aqua_positions}
+        orbs = [position for position in state.goal_orb_position
+                if components.get(position) not in aqua_components]
+        if not orbs:
+            return False
+        lava_times = self.lava_arrival_times(state, components, aqua_components)
+        player_distances = self.player_distances(state)
+        # The player dies on an orb that lava covers in the same move or before
+        return any(
+            orb in lava_times and player_distances.get(orb, math.inf) >= lava_times[orb]
+            for orb in orbs
+        )
+
+    def lava_arrival_times(self, state, components, aqua_components):
+        """
+        Moves until lava covers each cell, spreading from the lava that aqua can't reach
+        and through the cells aqua can't reach, a numbered block lets lava in
+        on the move it disappears
+        """
+        numbered_blocks = state.numbered_blocks
+        times = {}
+        frontier = [
+            (0, position) for position in state.lava_positions
+            if components.get(position) not in aqua_components
+        ]
+        heapq.heapify(frontier)
+        while frontier:
+            time, position = heapq.heappop(frontier)
+            if position in times:
+                continue
+            times[position] = time
+            x, y = position
+            for near in ((x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+                component = components.get(near)
+                if near in times or component is None or component in aqua_components:
+                    continue
+                heapq.heappush(frontier, (max(time + 1, numbered_blocks.get(near, 0)), near))
+        return times
         
+    def copy_elements(self, elements):
+        """Return the elements of a successor state that the transition can modify"""
+        if self.delta_successors:
+            return DeltaElements.successor(elements)
+        return self.fast_copy_elements(elements)
+
+    def copy_shared_elements(self, elements, positions):
+        """
+        Return a copy of elements shared by several new states
+        where the elements at the given positions can be modified
+        """
+        if self.delta_successors:
+            return DeltaElements.successor(elements)
+        elements = elements.copy()
+        for position in positions:
+            element = elements.get(position)
+            if element is not None and not element.is_shared:
+                elements[position] = element.copy()
+        return elements
+
+    def writable_element(self, elements, position):
+        """
+        Return the element at the position that the transition can modify in place,
+        a shared element (see GameElement.shared) is replaced by a copy first
+        """
+        if self.delta_successors:
+            return elements.writable(position)
+        element = elements[position]
+        if element.is_shared:
+            element = elements[position] = element.copy(position)
+        return element
+
     def fast_copy_elements(self, elements):
+        """Copy the elements, the shared ones are kept as they are"""
         return {
-            pos: GameElement(e.type, e.position, e.properties.copy())
+            pos: e if e.is_shared else e.copy()
             for pos, e in elements.items()
         }
 
@@ -1,67 +1,82 @@
 import pygame
+from element import ElementType, LAVA_WALL, GOAL_ORB, GOAL, PLAYER
 
 class ElementDrawer:
+    """
+    Draws the cells of the level: the tile of each (type, flags, moves remaining)
+    is drawn once on its own surface, and blitted from that cache after that
+    """
     def __init__(self):
-        pass
-        
+        self.tiles = {}
+
+    def tile_key(self, element):
+        """What a cell looks like: elements with the same key have the same tile"""
+        return (element.type, element.flags, element.moves_remaining)
+
     def draw_element(self, renderer, position, element):
         """Draw a single game element"""
-        x, y = position
-        screen_x = x * (renderer.cell_size + renderer.margin) + renderer.margin
-        screen_y = y * (renderer.cell_size + renderer.margin) + renderer.margin
-        cell_rect = pygame.Rect(
-            screen_x, 
-            screen_y, 
-            renderer.cell_size, 
-            renderer.cell_size
-        )
+        renderer.screen.blit(self.tile(renderer, element), renderer.cell_rect(position))
+
+    def tile(self, renderer, element):
+        """Return the cached tile surface of the element"""
+        key = self.tile_key(element)
+        tile = self.tiles.get(key)
+        if tile is None:
+            tile = self.tiles[key] = self.render_tile(renderer, element)
+        return tile
+
+    def render_tile(self, renderer, element):
+        """Draw the element on a new cell sized surface"""
+        # Same pixel format as the screen, so blitting it is a plain copy
+        surface = pygame.Surface((renderer.cell_size, renderer.cell_size), 0, renderer.screen)
+        cell_rect = surface.get_rect()
         # Get color based on element type (background color)
         color = renderer.get_element_color(element.type)
-        pygame.draw.rect(renderer.screen, color, cell_rect)
+        pygame.draw.rect(surface, color, cell_rect)
         # Add special rendering for different element types
-        if element.type.name == 'NUMBERED_BLOCK':
-            self.draw_numbered_block(renderer, cell_rect, element)
-        elif element.type.name == 'AQUA':
-            self.draw_aqua(renderer, cell_rect)
-        elif element.type.name == 'WALL':
-            self.draw_wall(renderer, cell_rect)
-        elif element.type.name == 'MOVABLE_BLOCK':
-            self.draw_movable_block(renderer, cell_rect)
-        if element.properties.get('lava_wall', False) == True:
-            self.draw_lava_wall(renderer, cell_rect)
-        elif element.properties.get('goal_orb', False) == True:
-            self.draw_goal_orb(renderer, cell_rect)
-        elif element.properties.get('goal', False) == True:
-            self.draw_goal(renderer, cell_rect)
-        if element.properties.get('player', False) == True:
-            self.draw_player(renderer, cell_rect)
+        if element.type is ElementType.NUMBERED_BLOCK:
+            self.draw_numbered_block(renderer, surface, cell_rect, element)
+        elif element.type is ElementType.AQUA:
+            self.draw_aqua(renderer, surface, cell_rect)
+        elif element.type is ElementType.WALL:
+            self.draw_wall(renderer, surface, cell_rect)
+        elif element.type is ElementType.MOVABLE_BLOCK:
+            self.draw_movable_block(renderer, surface, cell_rect)
+        if element.flags & LAVA_WALL:
+            self.draw_lava_wall(renderer, surface, cell_rect)
+        elif element.flags & GOAL_ORB:
+            self.draw_goal_orb(renderer, surface, cell_rect)
+        elif element.flags & GOAL:
+            self.draw_goal(renderer, surface, cell_rect)
+        if element.flags & PLAYER:
+            self.draw_player(renderer, surface, cell_rect)
+        return surface
 
-    
-    def draw_numbered_block(self, renderer, cell_rect, element):
+    def draw_numbered_block(self, renderer, surface, cell_rect, element):
         """Draw a numbered block with its move count"""
-        moves = element.properties.get('moves_remaining', '?')
+        moves = element.moves_remaining if element.moves_remaining is not None else '?'
         text = renderer.large_font.render(str(moves), True, (28,79,21))
         text_rect = text.get_rect(center=cell_rect.center)
-        renderer.screen.blit(text, text_rect)
-        pygame.draw.rect(renderer.screen, (28,79,21), cell_rect, 3)
+        surface.blit(text, text_rect)
+        pygame.draw.rect(surface, (28,79,21), cell_rect, 3)
     
-    def draw_player(self,renderer, cell_rect):
+    def draw_player(self, renderer, surface, cell_rect):
         """Draw the player with a special indicator"""
         pygame.draw.circle(
-            renderer.screen,
+            surface,
             (200, 170, 130),
             cell_rect.center,
             renderer.cell_size // 2,
         )
         pygame.draw.circle(
-            renderer.screen,
+            surface,
             (100, 100, 100),
             cell_rect.center,
             renderer.cell_size // 2,
             3
         )
     
-    def draw_aqua(self, renderer, cell_rect):
+    def draw_aqua(self, renderer, surface, cell_rect):
         """Draw aqua with water-like effect"""
         center_y = cell_rect.centery
         points = [
@@ -70,9 +85,9 @@ class ElementDrawer:
             (cell_rect.left + 2 * renderer.cell_size // 3, center_y + 3),
             (cell_rect.right, center_y)
         ]
-        pygame.draw.lines(renderer.screen, (42,42,213), False, points, 4)
+        pygame.draw.lines(surface, (42,42,213), False, points, 4)
     
-    def draw_lava_wall(self, renderer, cell_rect):
+    def draw_lava_wall(self, renderer, surface, cell_rect):
         """Draw lava and aqua wall shape"""
         center = cell_rect.center
         size = renderer.cell_size // 6
@@ -83,14 +98,14 @@ class ElementDrawer:
                 (center[0] + dx * 3 * size, center[1] + dy * 3 * size),
                 (center[0] + dx * 3 * size, center[1] + dy * size),
             ]
-            pygame.draw.polygon(renderer.screen, (120, 191, 220), points)
-            pygame.draw.polygon(renderer.screen, (0,0,0), points, 2)
+            pygame.draw.polygon(surface, (120, 191, 220), points)
+            pygame.draw.polygon(surface, (0,0,0), points, 2)
 
-    def draw_wall(self, renderer, cell_rect):
+    def draw_wall(self, renderer, surface, cell_rect):
         """Draw wall borders"""
-        pygame.draw.rect(renderer.screen, (0,0,0), cell_rect, 2)
+        pygame.draw.rect(surface, (0,0,0), cell_rect, 2)
 
-    def draw_movable_block(self, renderer, cell_rect):
+    def draw_movable_block(self, renderer, surface, cell_rect):
         """Draw movable block borders and the points in it"""
         center = cell_rect.center
         size = renderer.cell_size // 3
@@ -98,16 +113,16 @@ class ElementDrawer:
         for dx, dy in [(1, -1), (1, 1), (-1, -1), (-1, 1)]:
             pos = (center[0] + dx * size, center[1] + dy * size)
             pygame.draw.circle(
-                renderer.screen,
+                surface,
                 (49, 49, 49),
                 pos,
                 radius
             )
-        pygame.draw.rect(renderer.screen, (14,14,14), cell_rect, 2)
+        pygame.draw.rect(surface, (14,14,14), cell_rect, 2)
     
-    def draw_goal(self, renderer, cell_rect):
+    def draw_goal(self, renderer, surface, cell_rect):
         """Draw the goal with a special pattern"""
-        pygame.draw.rect(renderer.screen, (156,125,193), cell_rect, 30)
+        pygame.draw.rect(surface, (156,125,193), cell_rect, 30)
         center = cell_rect.center
         sizes = [renderer.cell_size // 3, renderer.cell_size // 4.5, renderer.cell_size // 9]
         colors = [(35,34,36), (156,125,193), (35,34,36)]
@@ -118,13 +133,13 @@ class ElementDrawer:
                 (center[0] - size, center[1] + size),
                 (center[0] - size, center[1] - size),
             ]
-            pygame.draw.polygon(renderer.screen, color, points)
-        pygame.draw.rect(renderer.screen, (35,34,36), cell_rect, 5)
+            pygame.draw.polygon(surface, color, points)
+        pygame.draw.rect(surface, (35,34,36), cell_rect, 5)
 
-    def draw_goal_orb(self,renderer, cell_rect):
+    def draw_goal_orb(self, renderer, surface, cell_rect):
         """Draw the goal orb with a special indicator"""
         pygame.draw.circle(
-            renderer.screen,
+            surface,
             (156,125,193),
             cell_rect.center,
             renderer.cell_size // 3,
@@ -1,14 +1,20 @@
 import time
 import pygame
+from element import GameElement, ElementType
 from .element_drawer import ElementDrawer
 
 class GameRenderer:
-    def __init__(self, cell_size=60, margin=2):
+    # Rendered texts and message boxes kept before their caches are cleared
+    TEXT_CACHE_SIZE = 256
+
+    def __init__(self, cell_size=60, margin=2, offscreen=False):
+        """offscreen: draw on a plain surface instead of a window (nothing is displayed)"""
         # Initialize pygame if not already initialized
         if not pygame.get_init():
             pygame.init()
         self.cell_size = cell_size
         self.margin = margin
+        self.offscreen = offscreen
         self.screen = None
         self.font = None
         # Define colors for each element type (background color for each)
@@ -23,49 +29,169 @@ class GameRenderer:
             'BACKGROUND': (230,230,230),
             'GRID': (60, 60, 60)
         }
-        # Load fonts
-        self.font = pygame.font.Font(None, 24)
-        self.large_font = pygame.font.Font(None, 36)
+        # Load fonts (one per size) and the caches of the texts and overlays drawn with them
+        self.fonts = {}
+        self.texts = {}
+        self.overlays = {}
+        self.message_boxes = {}
+        self.font = self.get_font(24)
+        self.large_font = self.get_font(36)
         self.element_drawer = ElementDrawer()
+        # Cached background of the level and what the last frame drew over it
+        self.background = None
+        self.background_key = None
+        self.drawn_state = None
+        self.text_rect = None
+        self.full_redraw = True
 
     def render(self, game_state, additional_text=None):
-        """Main render function - draws the entire game state"""
+        """Main render function - draws the game state and updates the parts of the screen that changed"""
+        dirty_rects = self.draw(game_state, additional_text)
+        if dirty_rects and not self.offscreen:
+            pygame.display.update(dirty_rects)
+
+    def draw(self, game_state, additional_text=None):
+        """
+        Draw the game state on the screen, return the rectangles that changed.
+        The background (grid and static walls) is cached and only blitted whole for a new
+        level or after something was drawn over the whole screen (full_redraw), otherwise
+        only the cells that differ from the previous frame and the text are redrawn
+        """
         if self.screen is None:
             self.initialize_screen(game_state)
-        self.draw_grid(game_state)
-        for position, element in game_state.elements.items():
-            self.draw_element(position, element)
+        static = getattr(game_state, 'static', None)
+        background_key = (static, game_state.width, game_state.height)
+        if self.background is None or self.background_key != background_key:
+            self.background = self.render_background(game_state, static)
+            self.background_key = background_key
+            self.full_redraw = True
+        if self.full_redraw or self.drawn_state is None:
+            self.screen.blit(self.background, (0, 0))
+            for position, element in self.cell_elements(game_state, static).items():
+                self.draw_element(position, element)
+            dirty_rects = [self.screen.get_rect()]
+            self.full_redraw = False
+        else:
+            dirty_rects = []
+            # Read once: they are rebuilt on each access for the bitboard states
+            elements = game_state.elements
+            steam_walls = game_state.wall_positions
+            if static is not None:
+                steam_walls = frozenset() if steam_walls is static.walls else steam_walls - static.walls
+            for position in self.changed_cells(self.drawn_state, game_state):
+                dirty_rects.append(self.draw_cell(elements, steam_walls, position))
+            if self.text_rect is not None:
+                # Put back what was under the previous text
+                self.screen.blit(self.background, self.text_rect, self.text_rect)
+                for position in self.cells_in(self.text_rect, game_state):
+                    self.draw_cell(elements, steam_walls, position)
+                dirty_rects.append(self.text_rect)
+        self.drawn_state = game_state
+        self.text_rect = None
         if additional_text:
-            self.draw_text(additional_text)
-        pygame.display.flip()
+            self.text_rect = self.draw_text(additional_text)
+            dirty_rects.append(self.text_rect)
+        return dirty_rects
+
+    def changed_cells(self, previous, game_state):
+        """
+        The positions where two states of the same level can look different,
+        found with set operations on their positions instead of comparing every element
+        (the lava walls never change, lava and aqua keep the cell flags)
+        """
+        changed = set()
+        for name in ('lava_positions', 'aqua_positions', 'movable_blocks', 'goal_orb_position', 'wall_positions'):
+            changed.update(getattr(previous, name) ^ getattr(game_state, name))
+        numbered = previous.numbered_blocks.items() ^ game_state.numbered_blocks.items()
+        changed.update(position for position, _ in numbered)
+        for name in ('player_position', 'goal_position'):
+            old_position, new_position = getattr(previous, name), getattr(game_state, name)
+            if old_position != new_position:
+                changed.update(position for position in (old_position, new_position) if position is not None)
+        return changed
+
+    def draw_cell(self, elements, steam_walls, position):
+        """Draw a cell over the background, return its rectangle"""
+        rect = self.cell_rect(position)
+        self.screen.blit(self.background, rect, rect)
+        element = elements.get(position)
+        if element is None and position in steam_walls:
+            element = GameElement.shared(ElementType.WALL)
+        if element is not None:
+            self.draw_element(position, element)
+        return rect
+
+    def cell_elements(self, game_state, static):
+        """The elements to draw over the background: position -> element"""
+        elements = game_state.elements
+        static_walls = static.walls if static is not None else frozenset()
+        wall_positions = game_state.wall_positions
+        if wall_positions is static_walls:
+            # No steam walls: all the walls are in the background
+            return elements
+        # The walls that are in neither the background nor the elements
+        cells = dict(elements)
+        wall = GameElement.shared(ElementType.WALL)
+        for position in wall_positions:
+            if position not in elements and position not in static_walls:
+                cells[position] = wall
+        return cells
+
+    def render_background(self, game_state, static):
+        """The grid and the static walls of the level on a screen sized surface"""
+        background = pygame.Surface(self.screen.get_size(), 0, self.screen)
+        self.draw_grid(game_state, background)
+        if static is not None:
+            wall = self.element_drawer.tile(self, GameElement.shared(ElementType.WALL))
+            for position in static.walls:
+                background.blit(wall, self.cell_rect(position))
+        return background
 
     def initialize_screen(self, game_state):
         """Create the pygame screen based on game state dimensions"""
         screen_width = game_state.width * (self.cell_size + self.margin) + self.margin
         screen_height = game_state.height * (self.cell_size + self.margin) + self.margin
-        self.screen = pygame.display.set_mode((screen_width, screen_height))
-        pygame.display.set_caption("LAVA AND AQUA GAME")
+        if self.offscreen:
+            self.screen = pygame.Surface((screen_width, screen_height))
+        else:
+            self.screen = pygame.display.set_mode((screen_width, screen_height))
+            pygame.display.set_caption("LAVA AND AQUA GAME")
+        self.full_redraw = True
         return self.screen
 
-    def draw_grid(self, game_state):
+    def cell_rect(self, position):
+        """The screen rectangle of a cell (without the grid lines around it)"""
+        x, y = position
+        step = self.cell_size + self.margin
+        return pygame.Rect(x * step + self.margin, y * step + self.margin, self.cell_size, self.cell_size)
+
+    def cells_in(self, rect, game_state):
+        """The positions of the cells that overlap a screen rectangle"""
+        step = self.cell_size + self.margin
+        first_x, first_y = max(0, rect.left // step), max(0, rect.top // step)
+        last_x = min(game_state.width - 1, (rect.right - 1) // step)
+        last_y = min(game_state.height - 1, (rect.bottom - 1) // step)
+        return [(x, y) for y in range(first_y, last_y + 1) for x in range(first_x, last_x + 1)]
+
+    def draw_grid(self, game_state, surface):
         """Draw the background grid"""
-        self.screen.fill(self.colors['BACKGROUND'])
+        surface.fill(self.colors['BACKGROUND'])
         for x in range(game_state.width + 1):
             line_x = x * (self.cell_size + self.margin)
             pygame.draw.line(
-                self.screen, 
+                surface,
                 self.colors['GRID'],
                 (line_x, 0),
-                (line_x, self.screen.get_height()),
+                (line_x, surface.get_height()),
                 1
             )
         for y in range(game_state.height + 1):
             line_y = y * (self.cell_size + self.margin)
             pygame.draw.line(
-                self.screen,
+                surface,
                 self.colors['GRID'],
                 (0, line_y),
-                (self.screen.get_width(), line_y),
+                (surface.get_width(), line_y),
                 1
             )
 
@@ -73,47 +199,82 @@ class GameRenderer:
         """Draw a single game element"""
         self.element_drawer.draw_element(self, position, element)
 
+    def get_font(self, size):
+        """Return the default font at a size, loaded once"""
+        font = self.fonts.get(size)
+        if font is None:
+            font = self.fonts[size] = pygame.font.Font(None, size)
+        return font
+
+    def render_text(self, text, size, color):
+        """Return the surface of a text, rendered once per (font size, text, colour)"""
+        key = (size, text, color)
+        surface = self.texts.get(key)
+        if surface is None:
+            if len(self.texts) >= self.TEXT_CACHE_SIZE:
+                self.texts.clear()
+            surface = self.texts[key] = self.get_font(size).render(text, True, color)
+        return surface
+
     def draw_text(self, text):
-        """Draw text at the top of the screen"""
-        text_surface = self.font.render(text, True, (255, 255, 255))
+        """Draw text at the top of the screen, return its rectangle"""
+        text_surface = self.render_text(text, 24, (255, 255, 255))
         text_rect = text_surface.get_rect(center=(self.screen.get_width() // 2, 20))
         self.screen.blit(text_surface, text_rect)
+        return text_rect.clip(self.screen.get_rect())
 
     def render_with_message(self, game_state, status_text, message=None):
         """Render the game state with message (optional) when game over or victory"""
-        self.render(game_state, status_text)
+        self.draw(game_state, status_text)
         if message:
             self.draw_centered_message(message)
-        pygame.display.flip()
+            # Drawn over the whole screen: the next frame starts from the background again
+            self.full_redraw = True
+        if not self.offscreen:
+            pygame.display.flip()
 
     def draw_centered_message(self, message, background_color=(0, 0, 0, 180), text_color=(255, 255, 255)):
         """Draw a centered message box with transparent background"""
-        overlay = pygame.Surface((self.screen.get_width(), self.screen.get_height()), pygame.SRCALPHA)
-        overlay.fill(background_color)
-        self.screen.blit(overlay, (0, 0))
-        font = pygame.font.Font(None, 48)
-        text = font.render(message, True, text_color)
-        text_rect = text.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() // 2))
-        box_padding = 20
-        box_rect = pygame.Rect(
-            text_rect.left - box_padding,
-            text_rect.top - box_padding,
-            text_rect.width + 2 * box_padding,
-            text_rect.height + 2 * box_padding
-        )
-        pygame.draw.rect(self.screen, (50, 50, 50), box_rect, border_radius=10)
-        pygame.draw.rect(self.screen, (200, 200, 200), box_rect, width=2, border_radius=10)
-        self.screen.blit(text, text_rect)
-        instruction_font = pygame.font.Font(None, 24)
-        instruction_text = instruction_font.render("Press R to restart or ESC to quit or U to undo", True, (200, 200, 200))
-        instruction_rect = instruction_text.get_rect(center=(self.screen.get_width() // 2, text_rect.bottom + 40))
+        self.screen.blit(self.get_overlay(background_color), (0, 0))
+        box = self.get_message_box(message, text_color)
+        box_rect = box.get_rect(center=(self.screen.get_width() // 2, self.screen.get_height() // 2))
+        self.screen.blit(box, box_rect)
+        instruction_text = self.render_text("Press R to restart or ESC to quit or U to undo", 24, (200, 200, 200))
+        # 40 below the message text (the box has 20 of padding)
+        instruction_rect = instruction_text.get_rect(center=(self.screen.get_width() // 2, box_rect.bottom - 20 + 40))
         self.screen.blit(instruction_text, instruction_rect)
 
+    def get_overlay(self, background_color):
+        """Return the transparent screen sized overlay of a colour, built once per screen size"""
+        key = (self.screen.get_size(), background_color)
+        overlay = self.overlays.get(key)
+        if overlay is None:
+            overlay = self.overlays[key] = pygame.Surface(self.screen.get_size(), pygame.SRCALPHA)
+            overlay.fill(background_color)
+        return overlay
+
+    def get_message_box(self, message, text_color):
+        """Return the surface of the box with the message in it, built once per message"""
+        key = (message, text_color)
+        box = self.message_boxes.get(key)
+        if box is None:
+            if len(self.message_boxes) >= self.TEXT_CACHE_SIZE:
+                self.message_boxes.clear()
+            text = self.render_text(message, 48, text_color)
+            box_padding = 20
+            box = pygame.Surface((text.get_width() + 2 * box_padding, text.get_height() + 2 * box_padding),
+                                 pygame.SRCALPHA)
+            box_rect = box.get_rect()
+            pygame.draw.rect(box, (50, 50, 50), box_rect, border_radius=10)
+            pygame.draw.rect(box, (200, 200, 200), box_rect, width=2, border_radius=10)
+            box.blit(text, (box_padding, box_padding))
+            self.message_boxes[key] = box
+        return box
+
     def render_win_path(self, level_file, algorithm_name, states_explored, generated_states, goal_state, path_cost, elapsed_time):
         actions = []
         states = []
         current = goal_state
-        clock = pygame.time.Clock()
         while current.parent is not None:
             actions.append(current.action)
             states.append(current)
@@ -125,18 +286,21 @@ class GameRenderer:
             status_text = f"moves: {current_state.path_cost}"
             self.render(current_state, status_text)
             time.sleep(0.2)
+        status_text = f"moves: {current_state.path_cost}"
+        message = f"path cost {current_state.path_cost} - time {elapsed_time} - states explored {states_explored}"
+        self.render_with_message(current_state, status_text, message)
+        # Nothing changes anymore: sleep until an event instead of redrawing every frame
         keep_window_open = True
         while keep_window_open:
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
+            event = pygame.event.wait()
+            if event.type == pygame.QUIT:
+                keep_window_open = False
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_ESCAPE:
                     keep_window_open = False
-                elif event.type == pygame.KEYDOWN:
-                    if event.key == pygame.K_ESCAPE:
-                        keep_window_open = False
-            status_text = f"moves: {current_state.path_cost}"
-            message = f"path cost {current_state.path_cost} - time {elapsed_time} - states explored {states_explored}"
-            self.render_with_message(current_state, status_text, message)
-            clock.tick(60)
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # The screen surface still holds the last frame
+                pygame.display.flip()
         pygame.quit()
         print("-"*100)
         print(f"the level: {level_file}")
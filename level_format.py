@@ -0,0 +1,131 @@
+import os
+import re
+import mmap
+import struct
+import hashlib
+from cache_files import default_cache_directory, write_atomic, evict_least_recent
+
+# Binary level format:
+#   header: magic, format version, width, height, numbered block count (little endian)
+#   one bit grid per layer of LAYERS (bit y * width + x, lowest bit of the first byte first)
+#   the moves of the numbered blocks (signed 32-bit), in cell order
+MAGIC = b'LAQL'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHHHI')
+LAYERS = ('wall', 'player', 'goal', 'goal_orb', 'lava_wall', 'lava', 'aqua', 'block', 'numbered')
+MOVES = struct.Struct('<i')
+MAX_SIZE = 0xFFFF
+
+SET_BIT = re.compile('1')
+
+def grid_bytes(width, height):
+    return (width * height + 7) // 8
+
+def set_cells(grid, cells):
+    """Return the indices (below cells) of the set bits of a bit grid"""
+    # The bits as a string, lowest first, searched in C
+    bits = bin(int.from_bytes(grid, 'little'))[:1:-1]
+    return [match.start() for match in SET_BIT.finditer(bits, 0, cells)]
+
+def pack_level(width, height, layers, numbered):
+    """
+    Return the binary level:
+    layers: layer name -> cell indices, numbered: cell index -> moves of the numbered blocks
+    """
+    if not 0 < width <= MAX_SIZE or not 0 < height <= MAX_SIZE:
+        raise ValueError(f"Level size {width}x{height} out of range")
+    if any(not -2**31 <= moves < 2**31 for moves in numbered.values()):
+        raise ValueError("Numbered block moves out of range")
+    size = grid_bytes(width, height)
+    parts = [HEADER.pack(MAGIC, FORMAT_VERSION, width, height, len(numbered))]
+    for name in LAYERS:
+        indices = numbered.keys() if name == 'numbered' else layers.get(name, ())
+        grid = bytearray(size)
+        for index in indices:
+            grid[index >> 3] |= 1 << (index & 7)
+        parts.append(bytes(grid))
+    for index in sorted(numbered):
+        parts.append(MOVES.pack(numbered[index]))
+    return b''.join(parts)
+
+def unpack_level(data):
+    """
+    Read a binary level (bytes or a memory map),
+    return (width, height, layer name -> cell indices, cell index -> moves)
+    """
+    if len(data) < HEADER.size:
+        raise ValueError("Truncated level header")
+    magic, version, width, height, numbered_count = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError("Not a binary level")
+    if version != FORMAT_VERSION:
+        raise ValueError(f"Unsupported binary level version {version}")
+    size = grid_bytes(width, height)
+    moves_offset = HEADER.size + size * len(LAYERS)
+    if len(data) != moves_offset + MOVES.size * numbered_count:
+        raise ValueError("Truncated binary level")
+    cells = width * height
+    layers = {}
+    for layer, name in enumerate(LAYERS):
+        start = HEADER.size + layer * size
+        layers[name] = set_cells(data[start:start + size], cells)
+    numbered_cells = layers.pop('numbered')
+    if len(numbered_cells) != numbered_count:
+        raise ValueError("Numbered blocks don't match their moves")
+    numbered = {
+        index: MOVES.unpack_from(data, moves_offset + i * MOVES.size)[0]
+        for i, index in enumerate(numbered_cells)
+    }
+    return width, height, layers, numbered
+
+def read_level_file(path):
+    """Memory map a binary level file and unpack it"""
+    with open(path, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return unpack_level(data)
+
+def write_level_file(path, data):
+    """Write a binary level, renamed into place so a reader never sees half a file"""
+    write_atomic(path, data)
+
+def compiled_level_path(source, directory=None):
+    """Path of the compiled level of a CSV level (its contents) in the level cache"""
+    directory = directory or os.path.join(default_cache_directory(), "levels")
+    digest = hashlib.sha256(source)
+    digest.update(f"\0{FORMAT_VERSION}".encode())
+    return os.path.join(directory, f"{digest.hexdigest()}.lvl")
+
+class LevelCache:
+    """
+    The compiled levels of the CSV levels loaded so far, one binary level per CSV contents
+    hash in the levels directory of the cache directory (resolved when it is used).
+
+    At most max_entries files are kept, the least recently used ones are removed
+    first (a file's modification time is its last use), like SolutionCache.
+    The cache never makes a load fail: a file that can't be read or written is a miss.
+    """
+    def __init__(self, directory=None, max_entries=256):
+        self.directory = directory
+        self.max_entries = max_entries
+
+    def levels_directory(self):
+        return self.directory or os.path.join(default_cache_directory(), "levels")
+
+    def get(self, source):
+        """Return the compiled level of the CSV contents (unpacked, see unpack_level) or None"""
+        try:
+            path = compiled_level_path(source, self.levels_directory())
+            level = read_level_file(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return level
+
+    def put(self, source, level):
+        """Store a parsed level and remove the least recently used levels past max_entries"""
+        directory = self.levels_directory()
+        try:
+            write_level_file(compiled_level_path(source, directory), pack_level(*level))
+            evict_least_recent(directory, ".lvl", self.max_entries)
+        except (OSError, ValueError):
+            pass
@@ -1,25 +1,136 @@
 import sys
-from player_mode import PlayerMode
-from algorithm_mode import AlgorithmMode
+import json
+import argparse
+from algorithm_mode import AlgorithmMode, ENGINES
+from solution_cache import SolutionCache
+from element import LevelLoader
+from level_format import LevelCache
+from profiler import PhaseProfiler
+from algorithms.telemetry import SearchTelemetry
+from algorithms.open_list import OPEN_LISTS
+from algorithms.closed_set import CLOSED_SETS
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(
+        usage="python ./main.py level.csv [algorithm] [--engine {batch,bitboard,delta,dict}] [--open-list {bucket,heap}] [--closed-set {compact,disk,states}] [--fluid-pruning] [--headless] [--no-cache] [--level-cache] [--profile] [--telemetry FILE]\n"
+              "       python ./main.py --batch level.csv [level.csv ...] [--algorithms algorithm ...] [options]"
+    )
+    parser.add_argument("level", nargs="?", help="CSV level file in the levels/ folder")
+    parser.add_argument("algorithm", nargs="?", help="run this algorithm instead of player mode")
+    parser.add_argument("--engine", choices=sorted(ENGINES), default="dict",
+                        help="state representation used by the algorithm (default: dict)")
+    parser.add_argument("--open-list", choices=sorted(OPEN_LISTS), default=None,
+                        help="priority queue of UCS, A* and hill climbing (default: heap)")
+    parser.add_argument("--closed-set", choices=sorted(CLOSED_SETS), default=None,
+                        help="visited states of BFS, DFS, UCS, A* and hill climbing: the states, "
+                             "compact fingerprints with the path as action codes, or compact fingerprints "
+                             "spilled to a file in the temporary directory (default: states)")
+    parser.add_argument("--fluid-pruning", action="store_true",
+                        help="also drop the states where lava gets to a goal orb before the player can")
+    parser.add_argument("--compare-serial", action="store_true",
+                        help="hda_star: also solve with the serial A* and report the speedup (twice the work)")
+    parser.add_argument("--table-memory", type=float, default=None, metavar="MB",
+                        help="ida_star: memory of its transposition and bound tables in MB (default: 64)")
+    parser.add_argument("--headless", action="store_true",
+                        help="solve without opening a window and print the result")
+    parser.add_argument("--time-limit", type=float, default=None,
+                        help="seconds per solve before it stops with the timeout status")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="always search: don't use the solution cache")
+    parser.add_argument("--level-cache", action="store_true",
+                        help="load the CSV levels through the compiled level cache "
+                             "(~/.cache/lava_and_aqua/levels)")
+    parser.add_argument("--profile", action="store_true",
+                        help="time the engine and state phases of the solve, print them and write "
+                             "cProfile stats to --profile-output (the solution cache is not used)")
+    parser.add_argument("--profile-output", default="solve.pstats",
+                        help="pstats file written by --profile (default: solve.pstats), an empty name "
+                             "skips cProfile (its overhead inflates the phase times)")
+    parser.add_argument("--telemetry", default=None, metavar="FILE",
+                        help="write the search progress to this JSON lines file ('-': standard error), "
+                             "watch it with python telemetry_view.py FILE --follow")
+    parser.add_argument("--telemetry-every", type=int, default=50000, metavar="STATES",
+                        help="write a progress record every STATES explored states (default: 50000)")
+    parser.add_argument("--telemetry-interval", type=float, default=1.0, metavar="SECONDS",
+                        help="and at least every SECONDS seconds (default: 1)")
+    batch = parser.add_argument_group("batch mode")
+    batch.add_argument("--batch", nargs="+", metavar="LEVEL",
+                       help="solve these levels (names or glob patterns in levels/) on worker processes")
+    batch.add_argument("--algorithms", nargs="+", default=["a_star"], help="algorithms to run on every level")
+    batch.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    batch.add_argument("--memory-limit", type=float, default=None, help="address space cap per worker in MB")
+    batch.add_argument("--ordered", action="store_true",
+                       help="print the results in level order instead of as they finish")
+    batch.add_argument("--output", default=None, help="also write the results to this JSON lines file")
+    return parser.parse_args()
+
+def run_batch(args):
+    """Solve every (level, algorithm) pair of the batch and print one line per result"""
+    from batch_solver import solve_many
+    jobs = [(level_file, algorithm) for level_file in LevelLoader.level_files(args.batch, "levels") for algorithm in args.algorithms]
+    output = open(args.output, 'w') if args.output else None
+    try:
+        for result in solve_many(jobs, args.engine, args.workers, args.time_limit,
+                                 args.memory_limit, args.ordered, level_cache=args.level_cache):
+            line = f"{result.level_file:<20} {result.algorithm_name:<8} {result.status:<8}"
+            if result.solved:
+                line += f" cost {result.path_cost} in {result.search_time:.3f}s ({result.states_explored} states)"
+            elif result.error:
+                line += f" {result.error}"
+            print(line, flush=True)
+            if output:
+                output.write(json.dumps(result.to_dict()) + "\n")
+                output.flush()
+    finally:
+        if output:
+            output.close()
 
 def main():
-    argc = len(sys.argv)
-    if argc not in [2, 3]:
-        print("Missing command line arguments")
-        print("First Usage:  python ./main.py level.csv")
-        print("Second Usage: python ./main.py level.csv algorithm")
-        sys.exit(1)
-    level_file = f"levels/{sys.argv[1]}"
+    args = parse_arguments()
     try:
-        if argc == 2:
+        if args.level_cache:
+            LevelLoader.cache = LevelCache()
+        if args.batch:
+            # * Batch mode: many headless solves on worker processes
+            run_batch(args)
+            return
+        if args.level is None:
+            raise ValueError("a level file is needed (or --batch)")
+        level_file = f"levels/{args.level}"
+        if args.algorithm is None:
+            if args.headless:
+                raise ValueError("--headless needs an algorithm")
             # * Player mode
+            from player_mode import PlayerMode
             player_mode = PlayerMode(level_file)
             player_mode.run()
         else:
-            # * Algorithm mode
-            algorithm = sys.argv[2]
-            algorithm_mode = AlgorithmMode(level_file, algorithm)
-            algorithm_mode.run()
+            cache = None if args.no_cache or args.profile else SolutionCache()
+            telemetry = None
+            if args.telemetry:
+                telemetry = SearchTelemetry.open(args.telemetry, args.telemetry_every, args.telemetry_interval)
+            algorithm_mode = AlgorithmMode(level_file, args.algorithm, args.engine, args.open_list, args.fluid_pruning,
+                                           args.closed_set, cache, telemetry, args.compare_serial,
+                                           args.table_memory)
+            if args.headless:
+                # * Headless algorithm mode (pygame is never imported)
+                solve = lambda: print(algorithm_mode.solve(args.time_limit))
+            else:
+                # * Algorithm mode
+                solve = algorithm_mode.run
+            if args.profile:
+                profiler = PhaseProfiler()
+                profiler.profile(algorithm_mode.engine, solve, args.profile_output)
+                print(profiler.report())
+                if args.profile_output:
+                    print(f"cProfile stats written to {args.profile_output} (python -m pstats {args.profile_output})")
+            else:
+                solve()
+            if telemetry:
+                telemetry.close()
+    except KeyboardInterrupt:
+        print("Interrupted")
+        sys.exit(1)
     except Exception as e:
         print(f"Error: {e}")
         sys.exit(1)
@@ -0,0 +1,263 @@
+import os
+import re
+import sys
+import json
+import math
+import time
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from game_engine import GameEngine
+from element import LevelLoader
+
+def use_dummy_video():
+    """Render without a display: the SDL dummy video driver, set before pygame starts"""
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+def replay_states(level_file, actions, engine=None):
+    """Return the states of the level from the initial one through the actions"""
+    engine = engine or GameEngine()
+    state = engine.load_level(level_file)
+    states = [state]
+    for move, action in enumerate(actions, 1):
+        state = engine.transition_model(state, action)
+        if state is None:
+            raise ValueError(f"{action} at move {move} is not a valid move in {level_file}")
+        states.append(state)
+    return states
+
+class FrameWriter:
+    """
+    Encodes and writes the images on a background thread, so drawing the next frame
+    doesn't wait for the PNG encoder. At most max_pending images wait to be written
+    """
+    def __init__(self, max_pending=16):
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.pending = deque()
+        self.max_pending = max_pending
+        self.written = 0
+
+    def write(self, surface, path):
+        import pygame
+        # The screen is drawn over by the next frame: the thread gets a copy
+        self.pending.append(self.executor.submit(pygame.image.save, surface.copy(), path))
+        while len(self.pending) > self.max_pending:
+            self.pending.popleft().result()
+        self.written += 1
+
+    def close(self):
+        """Wait for the images left (raising the first write error)"""
+        try:
+            while self.pending:
+                self.pending.popleft().result()
+        finally:
+            self.executor.shutdown()
+
+class SolutionPlayback:
+    """
+    Replays a solution (the actions of a SolveResult) on its level with the GameRenderer:
+    offscreen as fast as the frames can be drawn (with the SDL dummy driver, no window),
+    or in a window with a delay between the moves
+    """
+    def __init__(self, level_file, actions, cell_size=60, offscreen=True):
+        if offscreen:
+            use_dummy_video()
+        # Imported here so that the solving part never imports pygame
+        from game_renderer.game_renderer import GameRenderer
+        self.level_file = level_file
+        self.states = replay_states(level_file, actions)
+        self.renderer = GameRenderer(cell_size=cell_size, offscreen=offscreen)
+
+    def frames(self, delay=0.0):
+        """Draw the states one after the other, yield (move, screen) once each one is drawn"""
+        import pygame
+        for move, state in enumerate(self.states):
+            self.renderer.render(state, f"moves: {state.path_cost}")
+            yield move, self.renderer.screen
+            if not self.renderer.offscreen:
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT or (event.type == pygame.KEYDOWN and event.key == pygame.K_ESCAPE):
+                        return
+            if delay:
+                time.sleep(delay)
+
+    def play(self, delay=0.2):
+        """Show the solution in a window (or draw it offscreen), return the frames drawn"""
+        return sum(1 for _ in self.frames(delay))
+
+    def export_frames(self, directory, writer):
+        """Write one PNG per move in the directory"""
+        os.makedirs(directory, exist_ok=True)
+        for move, screen in self.frames():
+            writer.write(screen, os.path.join(directory, f"move_{move:04d}.png"))
+
+    def export_contact_sheet(self, path, writer, columns=10, scale=0.25):
+        """Write one image with all the moves in rows of columns thumbnails"""
+        import pygame
+        sheet = None
+        for move, screen in self.frames():
+            if sheet is None:
+                width = max(1, int(screen.get_width() * scale))
+                height = max(1, int(screen.get_height() * scale))
+                rows = math.ceil(len(self.states) / columns)
+                sheet = pygame.Surface((min(columns, len(self.states)) * width, rows * height))
+                sheet.fill(self.renderer.colors['GRID'])
+            row, column = divmod(move, columns)
+            sheet.blit(pygame.transform.smoothscale(screen, (width, height)), (column * width, row * height))
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        writer.write(sheet, path)
+
+    def close(self):
+        self.renderer.close()
+
+def output_name(level_file, algorithm):
+    """Name of the exported files of a solution: the level and the algorithm (a_star, bfs...)"""
+    level = os.path.splitext(os.path.basename(level_file))[0]
+    return f"{level}_{re.sub(r'[^a-z0-9]+', '_', algorithm.lower()).strip('_')}"
+
+def export_job(level_file, algorithm, actions, output_directory, frames=False, contact_sheet=True, cell_size=60,
+               columns=10, scale=0.25):
+    """Export the frames and/or the contact sheet of one solution inside a worker process"""
+    start_time = time.perf_counter()
+    playback = SolutionPlayback(level_file, actions, cell_size=cell_size)
+    writer = FrameWriter()
+    outputs = []
+    try:
+        name = output_name(level_file, algorithm)
+        if frames:
+            directory = os.path.join(output_directory, name)
+            playback.export_frames(directory, writer)
+            outputs.append(directory)
+        if contact_sheet:
+            path = os.path.join(output_directory, f"{name}_sheet.png")
+            playback.export_contact_sheet(path, writer, columns, scale)
+            outputs.append(path)
+    finally:
+        writer.close()
+        playback.close()
+    return {
+        'level_file': level_file,
+        'algorithm': algorithm,
+        'moves': len(actions),
+        'images': writer.written,
+        'outputs': outputs,
+        'time': time.perf_counter() - start_time
+    }
+
+def solution_job(level_file, algorithm, engine, use_cache):
+    """Solve a level (or reuse its cached solution), return its actions or None"""
+    from algorithm_mode import AlgorithmMode
+    from solution_cache import SolutionCache
+    cache = SolutionCache() if use_cache else None
+    result = AlgorithmMode(level_file, algorithm, engine, cache=cache).solve()
+    return result.actions if result.solved else None
+
+def playback_job(level_file, algorithm, actions, engine, use_cache, export_options):
+    """Worker process job: get the solution (when not given) and export it"""
+    try:
+        if actions is None:
+            actions = solution_job(level_file, algorithm, engine, use_cache)
+            if actions is None:
+                return {'level_file': level_file, 'algorithm': algorithm, 'error': "no solution"}
+        return export_job(level_file, algorithm, actions, **export_options)
+    except Exception as e:
+        return {'level_file': level_file, 'algorithm': algorithm, 'error': str(e)}
+
+def export_many(jobs, engine="dict", use_cache=True, workers=None, **export_options):
+    """
+    Export the (level_file, algorithm, actions or None) jobs on worker processes, the levels
+    without actions are solved with the algorithm first. Yield one summary dict per job as they
+    finish. The jobs with the same output name (level and algorithm) are exported once
+    """
+    unique_jobs = {}
+    for level_file, algorithm, actions in jobs:
+        unique_jobs.setdefault(output_name(level_file, algorithm), (level_file, algorithm, actions))
+    executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=use_dummy_video)
+    futures = []
+    try:
+        for level_file, algorithm, actions in unique_jobs.values():
+            futures.append(executor.submit(playback_job, level_file, algorithm, actions, engine, use_cache,
+                                           export_options))
+        for future in as_completed(futures):
+            yield future.result()
+    finally:
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=False)
+
+def results_jobs(results_file):
+    """The (level_file, algorithm, actions) of the solved results of a JSON lines file (main.py --batch --output)"""
+    jobs = []
+    with open(results_file) as file:
+        for line in file:
+            if line.strip():
+                result = json.loads(line)
+                if result.get('solved'):
+                    jobs.append((result['level_file'], result['algorithm_name'], result['actions']))
+    return jobs
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Replay solutions offscreen and export their frames or contact sheets")
+    parser.add_argument("levels", nargs="*", help="level files (glob patterns allowed)")
+    parser.add_argument("--results", default=None,
+                        help="replay the solved results of this JSON lines file (main.py --batch --output)")
+    parser.add_argument("--algorithm", default="a_star", help="algorithm that solves the levels (default: a_star)")
+    parser.add_argument("--engine", default="dict", help="engine of the solves (default: dict)")
+    parser.add_argument("--no-cache", action="store_true", help="don't use the solution cache")
+    parser.add_argument("--output", default="playback", help="output directory (default: playback)")
+    parser.add_argument("--frames", action="store_true", help="write one PNG per move")
+    parser.add_argument("--contact-sheet", action="store_true",
+                        help="write one image per level with every move (the default output)")
+    parser.add_argument("--cell-size", type=int, default=30, help="cell size of the frames in pixels (default: 30)")
+    parser.add_argument("--columns", type=int, default=10, help="thumbnails per contact sheet row (default: 10)")
+    parser.add_argument("--scale", type=float, default=0.25, help="contact sheet thumbnail scale (default: 0.25)")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--window", action="store_true",
+                        help="play the solution of the first level in a window instead of exporting")
+    parser.add_argument("--delay", type=float, default=0.2, help="seconds between the moves in --window (default: 0.2)")
+    return parser.parse_args()
+
+def main():
+    args = parse_arguments()
+    try:
+        jobs = results_jobs(args.results) if args.results else []
+        jobs.extend((level_file, args.algorithm, None) for level_file in LevelLoader.level_files(args.levels))
+        if not jobs:
+            raise ValueError("no levels to play back (level files or --results)")
+        if args.window:
+            level_file, algorithm, actions = jobs[0]
+            if actions is None:
+                actions = solution_job(level_file, algorithm, args.engine, not args.no_cache)
+                if actions is None:
+                    raise ValueError(f"no solution for {level_file}")
+            playback = SolutionPlayback(level_file, actions, cell_size=args.cell_size, offscreen=False)
+            playback.play(args.delay)
+            playback.close()
+            return
+        export_options = {
+            'output_directory': args.output,
+            'frames': args.frames,
+            'contact_sheet': args.contact_sheet or not args.frames,
+            'cell_size': args.cell_size,
+            'columns': args.columns,
+            'scale': args.scale
+        }
+        for summary in export_many(jobs, args.engine, not args.no_cache, args.workers,
+                                   **export_options):
+            if 'error' in summary:
+                print(f"{summary['level_file']:<20} {summary['algorithm']:<8} error: {summary['error']}", flush=True)
+            else:
+                print(f"{summary['level_file']:<20} {summary['algorithm']:<8} {summary['moves']:>4} moves {summary['images']:>5} images "
+                      f"in {summary['time']:.2f}s -> {', '.join(summary['outputs'])}", flush=True)
+    except KeyboardInterrupt:
+        print("Interrupted")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
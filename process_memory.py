@@ -0,0 +1,33 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows: no memory cap and no peak RSS there
+    resource = None
+
+def limit_memory(memory_limit_mb):
+    """Cap the address space of this process (nothing without a limit or on Windows)"""
+    if memory_limit_mb and resource is not None:
+        limit = int(memory_limit_mb * 1024 * 1024)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB (None when unknown)"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    if sys.platform == 'darwin':
+        return peak / (1024 * 1024)
+    return peak / 1024
+
+def rss_mb():
+    """Resident set size of this process in MB (the peak one where the current one can't be read)"""
+    try:
+        with open('/proc/self/statm') as file:
+            pages = int(file.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError, IndexError, AttributeError):
+        return peak_rss_mb()
@@ -0,0 +1,109 @@
+import time
+import cProfile
+from element import GameState
+from bitboard_engine import BitboardState
+
+class PhaseProfiler:
+    """
+    Call counts and cumulative nanoseconds of the phases of a solve: the engine steps
+    (copying the elements, pushing blocks, the numbered / lava / aqua updates, pruning...)
+    and the state construction, hashing and comparisons.
+
+    install() wraps the phase methods that exist on the engine (on the instance only)
+    and on the state classes, uninstall() puts the originals back: nothing is wrapped
+    or checked while the profiler is not installed.
+    Every phase has a total time and a self time (without the phases it called),
+    the self times add up to the time spent in the phases.
+    """
+    ENGINE_PHASES = (
+        'load_level', 'expand', 'expand_layer', 'transition_model', 'apply_move', 'is_valid_move',
+        'target_position', 'copy_elements', 'copy_shared_elements', 'move_player', 'push_block', 'update_blocks',
+        'update_numbered_blocks', 'update_lava_blocks', 'update_aqua_blocks', 'step_blocks',
+        'prune_dead', 'goal_test'
+    )
+    STATE_PHASES = ('__init__', 'update_from_parent', 'packed', '__hash__', '__eq__')
+    STATE_CLASSES = (GameState, BitboardState)
+
+    def __init__(self):
+        # phase -> [calls, total ns, self ns]
+        self.phases = {}
+        # time spent in the phases called by each running phase
+        self.nested = []
+        self.installed = []
+        self.wall_time = 0
+
+    def timed(self, name, function):
+        """Return function wrapped to add its calls and time to the phase"""
+        stats = self.phases.setdefault(name, [0, 0, 0])
+        nested = self.nested
+        clock = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            nested.append(0)
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] += elapsed - nested.pop()
+                if nested:
+                    nested[-1] += elapsed
+        return wrapper
+
+    def install(self, engine):
+        for name in self.ENGINE_PHASES:
+            method = getattr(engine, name, None)
+            if method is not None:
+                setattr(engine, name, self.timed(f"{type(engine).__name__}.{name}", method))
+                self.installed.append((engine, name, None))
+        for state_class in self.STATE_CLASSES:
+            for name in self.STATE_PHASES:
+                # Only the methods the class defines, the inherited ones are timed on their class
+                function = state_class.__dict__.get(name)
+                if function is not None:
+                    setattr(state_class, name, self.timed(f"{state_class.__name__}.{name}", function))
+                    self.installed.append((state_class, name, function))
+
+    def uninstall(self):
+        for owner, name, function in reversed(self.installed):
+            if function is None:
+                # The wrapper is an instance attribute over the class method
+                delattr(owner, name)
+            else:
+                setattr(owner, name, function)
+        self.installed = []
+
+    def profile(self, engine, function, pstats_file=None):
+        """
+        Call function with the phases of the engine timed, and under cProfile
+        when pstats_file is given (the stats are written there), return its result
+        """
+        profile = cProfile.Profile() if pstats_file else None
+        self.install(engine)
+        start = time.perf_counter_ns()
+        try:
+            if profile is None:
+                return function()
+            return profile.runcall(function)
+        finally:
+            self.wall_time += time.perf_counter_ns() - start
+            self.uninstall()
+            if profile is not None:
+                profile.dump_stats(pstats_file)
+
+    def report(self):
+        """The phases that were called, by self time, as a table"""
+        lines = [f"{'phase':<40} {'calls':>10} {'total ms':>10} {'self ms':>10} {'ns/call':>9} {'self %':>7}"]
+        wall_time = self.wall_time or 1
+        phases = sorted(self.phases.items(), key=lambda item: item[1][2], reverse=True)
+        for name, (calls, total, own) in phases:
+            if calls == 0:
+                continue
+            lines.append(f"{name:<40} {calls:>10} {total / 1e6:>10.1f} {own / 1e6:>10.1f} "
+                         f"{own // calls:>9} {100 * own / wall_time:>6.1f}%")
+        untimed = self.wall_time - sum(stats[2] for stats in self.phases.values())
+        lines.append(f"{'outside the phases (search)':<40} {'':>10} {'':>10} {untimed / 1e6:>10.1f} "
+                     f"{'':>9} {100 * untimed / wall_time:>6.1f}%")
+        return "\n".join(lines)
@@ -0,0 +1,61 @@
+import os
+import json
+import hashlib
+from game_engine import ENGINE_RULES_VERSION
+from algorithms.search_algorithm import SolveResult
+from cache_files import default_cache_directory, write_atomic, evict_least_recent
+
+class SolutionCache:
+    """
+    On-disk cache of the solved levels: one JSON file (the SolveResult) per
+    level contents hash, algorithm and ENGINE_RULES_VERSION, so an edited level
+    or a rule change never reuses an old solution.
+
+    At most max_entries files are kept, the least recently used ones are removed
+    first (a file's modification time is its last use).
+    The cache never makes a solve fail: a file that can't be read or written is a miss.
+    """
+    def __init__(self, directory=None, max_entries=256):
+        self.directory = directory or default_cache_directory()
+        self.max_entries = max_entries
+
+    def key(self, level_file, algorithm):
+        """Hash of the level contents, the algorithm and the rules version"""
+        digest = hashlib.sha256()
+        with open(level_file, 'rb') as file:
+            digest.update(file.read())
+        digest.update(f"\0{algorithm}\0{ENGINE_RULES_VERSION}".encode())
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, level_file, algorithm):
+        """Return the cached SolveResult or None"""
+        try:
+            path = self.path(self.key(level_file, algorithm))
+            with open(path) as file:
+                result = SolveResult.from_dict(json.load(file))
+            os.utime(path)
+        except (OSError, ValueError, TypeError):
+            return None
+        return result
+
+    def put(self, level_file, algorithm, result):
+        """Store a solved result and remove the least recently used entries past max_entries"""
+        try:
+            path = self.path(self.key(level_file, algorithm))
+            write_atomic(path, json.dumps(result.to_dict()).encode())
+            self.evict()
+        except OSError:
+            pass
+
+    def discard(self, level_file, algorithm):
+        """Remove an entry (a cached solution that turned out to be wrong)"""
+        try:
+            os.remove(self.path(self.key(level_file, algorithm)))
+        except OSError:
+            pass
+
+    def evict(self):
+        evict_least_recent(self.directory, ".json", self.max_entries)
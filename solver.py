@@ -0,0 +1,14 @@
+from algorithm_mode import AlgorithmMode
+from algorithms.search_algorithm import SolveResult
+
+def solve(level_file, algorithm="a_star", engine="dict", time_limit=None, open_list=None,
+          fluid_pruning=False, closed_set=None) -> SolveResult:
+    """
+    Solve a level file with an algorithm without importing or initialising pygame
+    return a SolveResult (actions, path cost, states explored/generated and timings)
+    time_limit: seconds after which the search stops with the 'timeout' status
+    open_list: 'heap' or 'bucket' for UCS, A* and hill climbing
+    fluid_pruning: also prune the states where lava gets to a goal orb before the player
+    closed_set: 'states', 'compact' or 'disk' for BFS, DFS, UCS, A* and hill climbing
+    """
+    return AlgorithmMode(level_file, algorithm, engine, open_list, fluid_pruning, closed_set).solve(time_limit)
@@ -0,0 +1,76 @@
+import sys
+import json
+import time
+import argparse
+
+# Rate under this share of the best rate so far is flagged as a throughput drop
+DROP_RATIO = 0.5
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Show the progress records of main.py --telemetry")
+    parser.add_argument("file", nargs="?", default="-", help="JSON lines telemetry file (default: standard input)")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep reading the file as the search writes it, until its end record")
+    return parser.parse_args()
+
+def read_records(file, follow):
+    """Yield the records of the stream, waiting for new lines when following a file"""
+    buffer = ""
+    while True:
+        line = file.readline()
+        if not line:
+            if not follow:
+                return
+            time.sleep(0.2)
+            continue
+        buffer += line
+        if not buffer.endswith("\n"):
+            # Half written line, the rest comes with the next read
+            continue
+        try:
+            record = json.loads(buffer)
+        except ValueError:
+            record = None
+        buffer = ""
+        if record is not None:
+            yield record
+            if follow and record.get('event') == 'end':
+                return
+
+def optional(value, width, spec=""):
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}{spec}}"
+
+def format_row(record, best_rate):
+    row = (f"{record['time']:>9.1f} {record['explored']:>11} {record['generated']:>11} "
+           f"{record['rate']:>9} {optional(record.get('open'), 10)} {optional(record.get('closed'), 10)} "
+           f"{optional(record.get('bound'), 8)} {optional(record.get('rss_mb'), 9, '.1f')}")
+    if record['event'] == 'progress' and best_rate and record['rate'] < best_rate * DROP_RATIO:
+        row += f"  rate down to {100 * record['rate'] / best_rate:.0f}% of its best"
+    return row
+
+def main():
+    args = parse_arguments()
+    file = sys.stdin if args.file == "-" else open(args.file)
+    best_rate = 0
+    try:
+        for record in read_records(file, args.follow and file is not sys.stdin):
+            event = record.get('event')
+            if event == 'start':
+                print(f"{record.get('algorithm')} on {record.get('level')}")
+                print(f"{'time s':>9} {'explored':>11} {'generated':>11} {'states/s':>9} {'open':>10} "
+                      f"{'closed':>10} {'depth/f':>8} {'rss MB':>9}")
+                best_rate = 0
+            elif event == 'progress':
+                print(format_row(record, best_rate), flush=True)
+                best_rate = max(best_rate, record['rate'])
+            elif event == 'end':
+                print(format_row(record, 0))
+                print(f"{record.get('status')} after {record['time']:.1f}s", flush=True)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if file is not sys.stdin:
+            file.close()
+
+if __name__ == '__main__':
+    main()
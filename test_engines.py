@@ -0,0 +1,86 @@
+import os
+import glob
+import random
+import unittest
+from game_engine import GameEngine
+from bitboard_engine import BitboardEngine, BitboardState
+
+try:
+    from batch_engine import BatchEngine, np
+except ImportError:
+    np = None
+
+LEVELS = sorted(glob.glob(os.path.join(os.path.dirname(os.path.abspath(__file__)), "levels", "*.csv")))
+LAYERS = ('wall', 'lava', 'aqua', 'block', 'lava_wall', 'goal_orb', 'goal', 'player', 'numbered')
+
+def layers(state):
+    """The layers of a state of any engine, to compare states across engines"""
+    if not isinstance(state, BitboardState):
+        state = BitboardState.from_game_state(state)
+    return tuple(getattr(state, name) for name in LAYERS)
+
+class EngineEquivalenceTest(unittest.TestCase):
+    """
+    Random walks on every level with the dict engine as the reference: the delta, bitboard
+    and batch engines must give the same valid moves and successors at every step
+    """
+    WALKS = 8
+    STEPS = 60
+
+    def setUp(self):
+        self.reference = GameEngine()
+        self.engines = [GameEngine(delta_successors=True), BitboardEngine()]
+        if np is not None:
+            self.engines.append(BatchEngine())
+
+    def walk(self, level_file, seed):
+        """Yield the reference state and the state of each engine after every random move"""
+        generator = random.Random(seed)
+        state = self.reference.load_level(level_file)
+        states = [engine.load_level(level_file) for engine in self.engines]
+        for _ in range(self.STEPS):
+            yield state, states
+            actions = self.reference.all_valid_moves(state)
+            if not actions:
+                return
+            action = generator.choice(actions)
+            state = self.reference.transition_model(state, action)
+            states = [engine.transition_model(other, action) for engine, other in zip(self.engines, states)]
+            if state is None:
+                self.assertEqual(states, [None] * len(states))
+                return
+
+    def test_successors(self):
+        for level_file in LEVELS:
+            for seed in range(self.WALKS):
+                for state, states in self.walk(level_file, seed):
+                    expected = [(action, layers(child)) for action, child in self.reference.expand(state)]
+                    for engine, other in zip(self.engines, states):
+                        with self.subTest(level=os.path.basename(level_file), seed=seed, engine=type(engine).__name__):
+                            self.assertEqual(layers(other), layers(state))
+                            self.assertEqual(engine.all_valid_moves(other), self.reference.all_valid_moves(state))
+                            self.assertEqual(engine.goal_test(other), self.reference.goal_test(state))
+                            self.assertEqual([(action, layers(child)) for action, child in engine.expand(other)],
+                                             expected)
+
+    @unittest.skipIf(np is None, "the batch engine needs numpy")
+    def test_expand_layer(self):
+        engine = BatchEngine()
+        for level_file in LEVELS:
+            layer = []
+            for seed in range(self.WALKS):
+                generator = random.Random(seed)
+                state = engine.load_level(level_file)
+                for _ in range(self.STEPS):
+                    layer.append(state)
+                    actions = engine.all_valid_moves(state)
+                    state = engine.transition_model(state, generator.choice(actions)) if actions else None
+                    if state is None:
+                        break
+            expected = [(parent, action, layers(child)) for parent in layer for action, child in engine.expand(parent)]
+            with self.subTest(level=os.path.basename(level_file)):
+                self.assertEqual([(parent, action, layers(child)) for parent, action, child in engine.expand_layer(layer)],
+                                 expected)
+
+if __name__ == '__main__':
+    unittest.main()